@@ -21,5 +21,6 @@ admin.site.register(DoctorProfile)
 admin.site.register(PatientProfile)
 admin.site.register(Appointment)
 admin.site.register(Feedback)
+admin.site.register(Chat)
 
 
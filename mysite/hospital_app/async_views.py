@@ -0,0 +1,199 @@
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse
+from django.views import View
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import exceptions
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from .facets import doctor_facets
+from .fastpath import compile_serializer
+from .fieldsets import sparse_queryset, sparse_requested
+from .filters import DoctorProfileFilter, DoctorSearchFilter
+from .models import Appointment, DoctorProfile, Feedback
+from .paginations import (AppointmentKeysetPagination, AppointmentPagination, DoctorProfileKeysetPagination,
+                          DoctorProfilePagination, KeysetPagination, count_disabled)
+from .serializers import (AppointmentSerializer, DoctorProfileDetailSerializer, DoctorProfileListSerializer,
+                          FeedbackSerializer)
+
+
+class AsyncReadView(View):
+    """
+    Async counterpart of a read-only DRF view, for ASGI servers.
+
+    JWT authentication, filter backends, serializers and paginators are the
+    ones the sync view uses, so both return the same JSON. Rows are read
+    with the async ORM (aget/acount/aiterator) and serialized with
+    compile_serializer(); only token user lookup, full-text search, facets
+    and keyset pages still run through sync_to_async().
+    """
+    queryset = None
+    serializer_class = None
+    pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
+    keyset_pagination_class = None
+    filter_backends = ()
+    authentication_required = False
+    renderer = JSONRenderer()
+
+    async def get(self, request, *args, **kwargs):
+        self.request = Request(request)
+        try:
+            user = await self.authenticate(request)
+            if user is None and self.authentication_required:
+                raise exceptions.NotAuthenticated()
+            if user is not None:
+                self.request.user = user
+            data = await self.read(*args, **kwargs)
+        except exceptions.APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return self.render(detail, exc.status_code)
+        return self.render(data)
+
+    def render(self, data, status=200):
+        return HttpResponse(self.renderer.render(data), status=status, content_type=self.renderer.media_type)
+
+    async def authenticate(self, request):
+        authenticator = JWTAuthentication()
+        header = authenticator.get_header(request)
+        raw_token = None if header is None else authenticator.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return await sync_to_async(authenticator.get_user)(authenticator.get_validated_token(raw_token))
+
+    def get_serializer(self):
+        return self.serializer_class(context={'request': self.request, 'view': self})
+
+    def get_queryset(self, serializer):
+        queryset = self.queryset.all()
+        if not sparse_requested(self.request):
+            return queryset
+        ordering = getattr(self.get_paginator(), 'ordering', None)
+        required = [field.lstrip('-') for field in ordering] if isinstance(ordering, (list, tuple)) else []
+        return sparse_queryset(queryset, serializer, required)
+
+    async def filter_queryset(self, queryset):
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(self.request, queryset, self)
+        return queryset
+
+    def get_paginator(self):
+        if not hasattr(self, 'paginator'):
+            params = self.request.query_params
+            if self.keyset_pagination_class and (
+                    params.get('pagination') == 'cursor' or KeysetPagination.cursor_query_param in params):
+                self.paginator = self.keyset_pagination_class()
+            else:
+                self.paginator = self.pagination_class()
+        return self.paginator
+
+    @staticmethod
+    async def fetch(queryset, size):
+        return [row async for row in queryset.aiterator(chunk_size=max(size, 1))]
+
+    async def paginate(self, queryset):
+        """The sync paginator's page, with COUNT and the page read through the async ORM."""
+        paginator, request = self.get_paginator(), self.request
+        if isinstance(paginator, KeysetPagination):
+            return await sync_to_async(paginator.paginate_queryset)(queryset, request, self)
+        paginator.request = request
+        countless = hasattr(paginator, 'count_skipped') and count_disabled(request)
+        paginator.count_skipped = countless
+
+        if isinstance(paginator, LimitOffsetPagination):
+            limit = paginator.limit = paginator.get_limit(request)
+            offset = paginator.offset = paginator.get_offset(request)
+            if countless:
+                rows = await self.fetch(queryset[offset:offset + limit + 1], limit + 1)
+                paginator.has_next = len(rows) > limit
+                return rows[:limit]
+            paginator.count = await queryset.acount()
+            if paginator.count == 0 or offset > paginator.count:
+                return []
+            return await self.fetch(queryset[offset:offset + limit], limit)
+
+        page_size = paginator.get_page_size(request)
+        number = request.query_params.get(paginator.page_query_param) or 1
+        if countless:
+            try:
+                paginator.number = int(number)
+            except ValueError:
+                paginator.number = 0
+            if paginator.number < 1:
+                raise exceptions.NotFound(paginator.invalid_page_message)
+            offset = (paginator.number - 1) * page_size
+            rows = await self.fetch(queryset[offset:offset + page_size + 1], page_size + 1)
+            paginator.has_next = len(rows) > page_size
+            return rows[:page_size]
+
+        django_paginator = paginator.django_paginator_class(queryset, page_size)
+        django_paginator.count = await queryset.acount()
+        if number in paginator.last_page_strings:
+            number = django_paginator.num_pages
+        try:
+            paginator.page = django_paginator.page(number)
+        except InvalidPage as exc:
+            raise exceptions.NotFound(paginator.invalid_page_message.format(page_number=number, message=str(exc)))
+        paginator.page.object_list = await self.fetch(paginator.page.object_list, page_size)
+        return paginator.page.object_list
+
+    async def read(self, *args, **kwargs):
+        serializer = self.get_serializer()
+        self.filtered_queryset = await self.filter_queryset(self.get_queryset(serializer))
+        rows = await self.paginate(self.filtered_queryset)
+        represent = compile_serializer(serializer)
+        return self.get_paginator().get_paginated_response([represent(row) for row in rows]).data
+
+
+class DoctorProfileListAsyncView(AsyncReadView):
+    queryset = DoctorProfile.objects.for_catalog()
+    serializer_class = DoctorProfileListSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = DoctorProfileFilter
+    ordering_fields = ['price']
+    pagination_class = DoctorProfilePagination
+    keyset_pagination_class = DoctorProfileKeysetPagination
+
+    async def filter_queryset(self, queryset):
+        queryset = await super().filter_queryset(queryset)
+        if self.request.query_params.get(api_settings.SEARCH_PARAM, '').strip():
+            queryset = await sync_to_async(DoctorSearchFilter().filter_queryset)(self.request, queryset, self)
+        return OrderingFilter().filter_queryset(self.request, queryset, self)
+
+    async def read(self, *args, **kwargs):
+        data = await super().read(*args, **kwargs)
+        if isinstance(data, dict) and self.request.query_params.get('facets', '').lower() not in ('0', 'false', 'no'):
+            data['facets'] = await sync_to_async(doctor_facets)(self.filtered_queryset)
+        return data
+
+
+class DoctorProfileDetailAsyncView(AsyncReadView):
+    queryset = DoctorProfile.objects.for_catalog()
+    serializer_class = DoctorProfileDetailSerializer
+
+    async def read(self, pk):
+        serializer = self.get_serializer()
+        try:
+            doctor = await self.get_queryset(serializer).aget(pk=pk)
+        except DoctorProfile.DoesNotExist:
+            raise exceptions.NotFound('No DoctorProfile matches the given query.')
+        return compile_serializer(serializer)(doctor)
+
+
+class AppointmentListAsyncView(AsyncReadView):
+    queryset = Appointment.objects.select_related('patient__user', 'doctor')
+    serializer_class = AppointmentSerializer
+    pagination_class = AppointmentPagination
+    keyset_pagination_class = AppointmentKeysetPagination
+
+
+class FeedbackListAsyncView(AsyncReadView):
+    queryset = Feedback.objects.select_related('patient__user', 'doctor')
+    serializer_class = FeedbackSerializer
+    authentication_required = True
+
+    async def filter_queryset(self, queryset):
+        return queryset.filter(patient__user=self.request.user)
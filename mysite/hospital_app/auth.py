@@ -0,0 +1,70 @@
+import hashlib
+import hmac
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+def failed_login_key(username, password):
+    digest = hmac.new(settings.SECRET_KEY.encode(), f'{username}\0{password}'.encode(), hashlib.sha256)
+    return f'login-failed:{digest.hexdigest()}'
+
+
+def authenticate_cached(username, password):
+    """
+    `authenticate()` that remembers rejected credentials for LOGIN_FAILURE_CACHE_SECONDS.
+
+    Retrying the same wrong username/password pair is answered from the
+    cache instead of hashing the password again for every backend.
+    """
+    key = failed_login_key(username, password)
+    if cache.get(key):
+        return None
+    user = authenticate(username=username, password=password)
+    if user is None or not user.is_active:
+        cache.set(key, True, settings.LOGIN_FAILURE_CACHE_SECONDS)
+        return None
+    return user
+
+
+def token_response(user):
+    refresh = RefreshToken.for_user(user)
+    return {
+        'user': {
+            'username': user.username,
+            'email': user.email,
+        },
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+    }
+
+
+@database_sync_to_async
+def jwt_user(raw_token):
+    authenticator = JWTAuthentication()
+    try:
+        return authenticator.get_user(authenticator.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate WebSocket connections with the access token in ?token=,
+    since browsers cannot send an Authorization header with them. Without
+    a token the session user set by AuthMiddlewareStack is kept.
+    """
+
+    async def __call__(self, scope, receive, send):
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+        if token:
+            scope = dict(scope, user=await jwt_user(token[-1]))
+        return await super().__call__(scope, receive, send)
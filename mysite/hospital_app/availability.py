@@ -0,0 +1,94 @@
+import datetime
+from django.conf import settings
+from django.utils import timezone
+from .models import Appointment, DoctorProfile
+
+WEEKDAYS = {name: number for number, name in enumerate(
+    ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])}
+
+
+def slot_minutes():
+    return getattr(settings, 'APPOINTMENT_SLOT_MINUTES', 30)
+
+
+class DoctorSchedule:
+    """
+    Free slots of one doctor kept as one integer bitmask per working day.
+
+    Bit `i` of a day's mask is the slot starting `i * slot` minutes after
+    `shift_start`, so marking a booking is a single bit clear and a whole
+    week of slots costs a handful of ints.
+    """
+
+    def __init__(self, doctor, start, end, slot, tz):
+        self.doctor_id = doctor.pk
+        self.slot = slot
+        self.tz = tz
+        self.shift_start = doctor.shift_start
+        first = doctor.shift_start.hour * 60 + doctor.shift_start.minute
+        last = doctor.shift_end.hour * 60 + doctor.shift_end.minute
+        if last <= first:
+            last += 24 * 60
+        self.size = (last - first) // slot
+        full = (1 << self.size) - 1
+        days = {WEEKDAYS[day] for day in doctor.working_days}
+        self.masks = {}
+        day = start
+        while day <= end:
+            if day.weekday() in days and self.size:
+                self.masks[day] = full
+            day += datetime.timedelta(days=1)
+
+    def day_start(self, day):
+        return timezone.make_aware(datetime.datetime.combine(day, self.shift_start), self.tz)
+
+    def book(self, date_time):
+        local = timezone.localtime(date_time, self.tz)
+        for day in (local.date(), local.date() - datetime.timedelta(days=1)):
+            mask = self.masks.get(day)
+            if not mask:
+                continue
+            index = int((local - self.day_start(day)).total_seconds() // 60) // self.slot
+            if 0 <= index < self.size:
+                self.masks[day] = mask & ~(1 << index)
+                return
+
+    def free_slots(self, after=None):
+        result = {}
+        for day, mask in sorted(self.masks.items()):
+            begin = self.day_start(day)
+            slots = []
+            while mask:
+                low = mask & -mask
+                slot_time = begin + datetime.timedelta(minutes=(low.bit_length() - 1) * self.slot)
+                if after is None or slot_time >= after:
+                    slots.append(slot_time.strftime('%H:%M'))
+                mask ^= low
+            if slots:
+                result[day.isoformat()] = slots
+        return result
+
+
+def doctor_availability(doctors, start, end):
+    """Map every doctor id to `{date: ['HH:MM', ...]}` of free slots between two dates."""
+    slot = slot_minutes()
+    tz = timezone.get_current_timezone()
+    schedules = {doctor.pk: DoctorSchedule(doctor, start, end, slot, tz) for doctor in doctors}
+    if not schedules:
+        return {}
+
+    range_start = timezone.make_aware(datetime.datetime.combine(start, datetime.time.min), tz)
+    range_end = timezone.make_aware(
+        datetime.datetime.combine(end + datetime.timedelta(days=2), datetime.time.min), tz)
+    booked = Appointment.objects.filter(
+        doctor_id__in=list(schedules), date_time__gte=range_start, date_time__lt=range_end,
+    ).exclude(status='cancelled').values_list('doctor_id', 'date_time')
+    for doctor_id, date_time in booked.iterator(chunk_size=2000):
+        schedules[doctor_id].book(date_time)
+
+    now = timezone.now()
+    return {pk: schedule.free_slots(after=now) for pk, schedule in schedules.items()}
+
+
+def schedule_queryset():
+    return DoctorProfile.objects.only('id', 'shift_start', 'shift_end', 'working_days').order_by('id')
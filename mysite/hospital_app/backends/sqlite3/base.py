@@ -0,0 +1,58 @@
+from django.db.backends.sqlite3 import base
+from hospital_app.write_queue import write_queue
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend that runs this process's write transactions one at a
+    time through write_queue (SQLITE_WRITE_QUEUE).
+
+    The queue is taken when a transaction begins and released when it
+    commits or rolls back; a write outside a transaction holds it for that
+    one statement. Reads, and whatever a request does before and after its
+    writes, such as password hashing, never wait for it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queued = False
+        self.execute_wrappers.append(self.queue_autocommit_write)
+
+    def dequeue(self):
+        if self.queued:
+            self.queued = False
+            write_queue.release()
+
+    def _start_transaction_under_autocommit(self):
+        self.queued = write_queue.hold()
+        try:
+            super()._start_transaction_under_autocommit()
+        except BaseException:
+            self.dequeue()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self.dequeue()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self.dequeue()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self.dequeue()
+
+    def queue_autocommit_write(self, execute, sql, params, many, context):
+        if self.in_atomic_block or not self.autocommit or not sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+            return execute(sql, params, many, context)
+        with write_queue.slot():
+            return execute(sql, params, many, context)
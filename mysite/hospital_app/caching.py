@@ -0,0 +1,75 @@
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import translation
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from .db_router import reading_from_replica
+
+
+def version_key(namespace):
+    return f'catalog-version:{namespace}'
+
+
+def get_versions(namespaces):
+    keys = [version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*namespaces):
+    """Make every cached response that depends on one of `namespaces` stale."""
+    cache.set_many({version_key(namespace): time.time_ns() for namespace in set(namespaces)}, None)
+
+
+class CachedResponseMixin:
+    """
+    Cache GET responses of read-mostly views per language and query string.
+
+    Keys embed a version number for each namespace the response depends on;
+    signal handlers bump those versions when the underlying rows change, so
+    stale entries are never read again and simply age out of the cache.
+    Responses carry an ETag and conditional requests get 304 Not Modified.
+    """
+    cache_namespaces = ()
+
+    def get_cache_namespaces(self):
+        return self.cache_namespaces
+
+    def get_response_cache_key(self, request, versions):
+        parts = [
+            type(self).__name__,
+            translation.get_language() or '',
+            repr(sorted(self.kwargs.items())),
+            repr(sorted(request.query_params.lists())),
+            repr(versions),
+        ]
+        return 'catalog-response:' + hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+    def get(self, request, *args, **kwargs):
+        versions = get_versions(self.get_cache_namespaces())
+        key = self.get_response_cache_key(request, versions)
+        entry = cache.get(key)
+        if entry is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            # A replica may not have the rows behind a recent invalidation yet; don't cache what it returned.
+            if reading_from_replica() and time.time_ns() - max(versions, default=0) < \
+                    settings.DATABASE_STICKY_SECONDS * 10 ** 9:
+                return response
+            body = json.dumps(response.data, cls=JSONEncoder, sort_keys=True).encode()
+            entry = (response.data, f'"{hashlib.md5(body).hexdigest()}"')
+            cache.set(key, entry, settings.CATALOG_CACHE_TIMEOUT)
+
+        data, etag = entry
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(data, headers={'ETag': etag})
@@ -0,0 +1,192 @@
+import asyncio
+import atexit
+import logging
+from collections import OrderedDict, deque
+from channels.db import database_sync_to_async
+from django.conf import settings
+from .models import Chat, DoctorProfile, Message, PatientProfile
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriteBuffer:
+    """
+    Write-behind buffer for chat messages.
+
+    Consumers hand over unsaved `Message` objects and return immediately;
+    the buffer bulk-inserts them once `batch_size` rows are waiting or
+    `flush_interval` seconds after the first pending row, whichever is first.
+    A failed batch is retried with a doubling delay; after `max_retries`
+    failures it is split in halves until the rows that cannot be stored
+    are found, and those are logged and dropped.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=0.5, max_retries=3):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.failures = 0
+        self.pending = []
+        self.timer = None
+
+    async def add(self, message):
+        self.pending.append(message)
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+        else:
+            self.arm(self.flush_interval)
+
+    def arm(self, delay):
+        if self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(delay, self.schedule_flush)
+
+    def schedule_flush(self):
+        self.timer = None
+        asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            if self.failures < self.max_retries:
+                await database_sync_to_async(self.write)(batch)
+            else:
+                await database_sync_to_async(self.salvage)(batch)
+            self.failures = 0
+        except Exception:
+            self.failures += 1
+            logger.exception('Could not store %d chat messages (attempt %d), retrying', len(batch), self.failures)
+            self.pending[:0] = batch
+            self.arm(self.flush_interval * 2 ** self.failures)
+
+    def write(self, batch):
+        # Ids handed out by a rolled-back attempt may have been taken since
+        for message in batch:
+            message.pk = None
+        Message.objects.bulk_create(batch, batch_size=self.batch_size)
+
+    def salvage(self, batch):
+        """Store every row of `batch` that can be stored on its own; log and drop the others."""
+        try:
+            self.write(batch)
+        except Exception:
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                self.salvage(batch[:middle])
+                self.salvage(batch[middle:])
+                return
+            logger.exception('Dropping chat message to chat %s by patient %s / doctor %s that cannot be stored',
+                             batch[0].chat_id, batch[0].author_id, batch[0].doctor_id)
+
+    def flush_sync(self):
+        batch, self.pending = self.pending, []
+        if batch:
+            self.salvage(batch)
+
+
+message_buffer = MessageWriteBuffer(
+    batch_size=getattr(settings, 'CHAT_WRITE_BATCH_SIZE', 100),
+    flush_interval=getattr(settings, 'CHAT_WRITE_FLUSH_INTERVAL', 0.5),
+    max_retries=getattr(settings, 'CHAT_WRITE_MAX_RETRIES', 3),
+)
+atexit.register(message_buffer.flush_sync)
+
+
+class RecentMessages:
+    """
+    Bounded in-memory history used to replay the last messages on connect.
+
+    Each room keeps a ring of at most `size` messages and at most `rooms`
+    rooms stay in memory, least recently used first out. A cold room is
+    loaded from the database once, however many clients reconnect at the
+    same moment.
+
+    Rings are fed from the room group's chat.message events, so messages
+    sent through other processes are recorded too; the event id keeps the
+    several local consumers of a room from adding the same message twice.
+    Only rooms with a consumer in this process receive those events, so a
+    room's ring is dropped when its last local consumer leaves and is
+    loaded again on the next connect.
+    """
+
+    def __init__(self, size=50, rooms=1000):
+        self.size = size
+        self.rooms = rooms
+        self.rings = OrderedDict()
+        self.loading = {}
+        self.listeners = {}
+
+    def join(self, room_name):
+        self.listeners[room_name] = self.listeners.get(room_name, 0) + 1
+
+    def leave(self, room_name):
+        self.listeners[room_name] = self.listeners.get(room_name, 1) - 1
+        if self.listeners[room_name] <= 0:
+            del self.listeners[room_name]
+            self.rings.pop(room_name, None)
+
+    def append(self, room_name, event_id, message):
+        ring = self.rings.get(room_name)
+        if ring is not None and (event_id is None or all(seen != event_id for seen, _ in ring)):
+            ring.append((event_id, message))
+
+    async def get(self, room_name, chat_id):
+        ring = self.rings.get(room_name)
+        if ring is not None:
+            self.rings.move_to_end(room_name)
+            return [message for _, message in ring]
+        if chat_id is None:
+            ring = self.store(room_name, [])
+            return [message for _, message in ring]
+
+        task = self.loading.get(room_name)
+        if task is None:
+            task = self.loading[room_name] = asyncio.ensure_future(self.load(room_name, chat_id))
+            task.add_done_callback(lambda done: self.loading.pop(room_name, None))
+        return [message for _, message in await asyncio.shield(task)]
+
+    async def load(self, room_name, chat_id):
+        await message_buffer.flush()
+        texts = await database_sync_to_async(self.query)(chat_id)
+        return self.store(room_name, texts)
+
+    def query(self, chat_id):
+        rows = Message.objects.filter(chat_id=chat_id).exclude(text=None).order_by(
+            '-created_date', '-id').values_list('text', flat=True)[:self.size]
+        return list(reversed(rows))
+
+    def store(self, room_name, messages):
+        ring = self.rings[room_name] = deque([(None, message) for message in messages], maxlen=self.size)
+        while len(self.rings) > self.rooms:
+            self.rings.popitem(last=False)
+        return ring
+
+
+recent_messages = RecentMessages(
+    size=getattr(settings, 'CHAT_REPLAY_SIZE', 50),
+    rooms=getattr(settings, 'CHAT_REPLAY_ROOMS', 1000),
+)
+
+
+@database_sync_to_async
+def get_chat_author(room_name, user):
+    """
+    The chat of `room_name` if `user` is one of its members (else None), and
+    the Message fields naming them as author: their patient profile, or their
+    doctor profile for the doctors of the chat.
+    """
+    chat_id = None
+    if room_name.isdigit():
+        chat_id = Chat.objects.of_member(user).filter(pk=room_name).values_list('pk', flat=True).first()
+    if chat_id is None:
+        return None, None
+    author_id = PatientProfile.objects.filter(user_id=user.pk, chat=chat_id).values_list('pk', flat=True).first()
+    if author_id is not None:
+        return chat_id, {'author_id': author_id}
+    if DoctorProfile.objects.filter(pk=user.pk, chat=chat_id).exists():
+        return chat_id, {'doctor_id': user.pk}
+    return chat_id, None
@@ -1,34 +1,67 @@
-import json
+import uuid
 from channels.generic.websocket import AsyncWebsocketConsumer
+from .chat_store import get_chat_author, message_buffer, recent_messages
+from .frames import MSGPACK_SUBPROTOCOL, decode, frame_cache
+from .models import Message
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.room_name = self.scope["url_route"]["kwargs"]["room_name"]
         self.room_group_name = f"chat_{self.room_name}"
+        self.binary = MSGPACK_SUBPROTOCOL in self.scope.get("subprotocols", [])
+        self.chat_id, self.author = await get_chat_author(self.room_name, self.scope.get("user"))
+        if self.chat_id is None:
+            # Not a chat this user belongs to
+            await self.close()
+            return
 
         # Join room group
+        recent_messages.join(self.room_name)
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
 
-        await self.accept()
+        await self.accept(subprotocol=MSGPACK_SUBPROTOCOL if self.binary else None)
+
+        # Replay recent history
+        for message in await recent_messages.get(self.room_name, self.chat_id):
+            await self.send_payload({"message": message})
 
     async def disconnect(self, close_code):
+        if self.chat_id is None:
+            return
         # Leave room group
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        recent_messages.leave(self.room_name)
+        await message_buffer.flush()
 
     # Receive message from WebSocket
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message = text_data_json["message"]
+    async def receive(self, text_data=None, bytes_data=None):
+        message = decode(text_data, bytes_data)["message"]
 
         # Send message to room group
-        await self.channel_layer.group_send(
-            self.room_group_name, {"type": "chat.message", "message": message}
-        )
+        event = {"type": "chat.message", "id": uuid.uuid4().hex, "message": message}
+        await self.channel_layer.group_send(self.room_group_name, event)
+
+        # Store it without waiting for the database
+        if self.chat_id is not None and self.author is not None:
+            await message_buffer.add(Message(chat_id=self.chat_id, text=message, **self.author))
 
     # Receive message from room group
     async def chat_message(self, event):
-        message = event["message"]
+        # Every process with a consumer in the room records it, whichever process it was sent from
+        recent_messages.append(self.room_name, event.get("id"), event["message"])
 
         # Send message to WebSocket
-        await self.send(text_data=json.dumps({"message": message}))
\ No newline at end of file
+        await self.send_payload({"message": event["message"]}, event.get("id"))
+
+    # Receive a finished image or video upload from the room group
+    async def chat_attachment(self, event):
+        await self.send_payload({"attachment": event["attachment"]}, event.get("id"))
+
+    async def send_payload(self, payload, event_id=None):
+        # Group events are encoded once per process and framing, not once per member
+        frame = frame_cache.get(event_id, payload, self.binary)
+        if self.binary:
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
@@ -0,0 +1,85 @@
+import random
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+def reading_from_replica():
+    return bool(settings.DATABASE_REPLICAS) and replica_reads.get()
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes go to the primary; reads go to a random replica only while
+    ReplicaRoutingMiddleware allows it for the current request. Management
+    commands, consumers and anything else outside a request read from the
+    primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if reading_from_replica():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def reads_from_replica(request):
+    return request.method in SAFE_METHODS and settings.DATABASE_STICKY_COOKIE not in request.COOKIES
+
+
+def stick_to_primary(request, response):
+    """After a successful write, read this client's next requests from the primary (read-your-writes)."""
+    if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS and response.status_code < 400:
+        response.set_cookie(settings.DATABASE_STICKY_COOKIE, '1', max_age=settings.DATABASE_STICKY_SECONDS,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let GET/HEAD/OPTIONS requests read from replicas. Other methods, such as
+    the create views and MedicalRecordRetrieveAPIView's PUT/PATCH/DELETE, use
+    the primary for their reads too, and set a short-lived cookie that keeps
+    the client on the primary until replicas have caught up.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = replica_reads.set(reads_from_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return stick_to_primary(request, response)
+
+    async def __acall__(self, request):
+        token = replica_reads.set(reads_from_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return stick_to_primary(request, response)
@@ -0,0 +1,54 @@
+from django.db.models import Count, F, Q, TextField, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.db.models.lookups import GreaterThan
+from django.utils.translation import get_language
+from modeltranslation.utils import build_localized_fieldname
+from .models import Department, DoctorProfile, Specialty
+
+EXPERIENCE_BUCKETS = ((0, 4), (5, 9), (10, 19), (20, None))
+RATING_BUCKETS = (1, 2, 3, 4)
+
+
+def localized_name(prefix, field):
+    localized = F(f'{prefix}{build_localized_fieldname(field, get_language() or "en")}')
+    return Coalesce(NullIf(localized, Value(''), output_field=TextField()), F(f'{prefix}{field}'),
+                    output_field=TextField())
+
+
+def doctor_facets(queryset):
+    """
+    Facet counts for the doctors in `queryset` using three queries.
+
+    Gender, working day, experience and rating buckets come from one
+    conditional aggregate over the matching doctors; specialty and
+    department counts come from one GROUP BY each.
+    """
+    doctor_ids = queryset.order_by().values('pk')
+    doctors = DoctorProfile.objects.filter(pk__in=doctor_ids)
+
+    scalars = {'gender_true': Count('pk', filter=Q(gender=True)), 'gender_false': Count('pk', filter=Q(gender=False))}
+    for day, bit in DoctorProfile.DAY_BITS.items():
+        scalars[f'day_{day}'] = Count('pk', filter=GreaterThan(F('working_days_mask').bitand(bit), 0))
+    for low, high in EXPERIENCE_BUCKETS:
+        condition = Q(experience__gte=low) if high is None else Q(experience__gte=low, experience__lte=high)
+        scalars[f'experience_{low}'] = Count('pk', filter=condition)
+    for low in RATING_BUCKETS:
+        scalars[f'rating_{low}'] = Count('pk', filter=Q(avg_rating__gte=low))
+    totals = doctors.aggregate(**scalars)
+
+    specialties = Specialty.doctor.through.objects.filter(doctorprofile_id__in=doctor_ids).annotate(
+        name=localized_name('specialty__', 'specialty_name')).values('specialty_id', 'name').annotate(
+        count=Count('doctorprofile_id')).order_by('-count', 'name').values_list('specialty_id', 'name', 'count')
+    departments = Department.objects.filter(doctor_id__in=doctor_ids).annotate(
+        name=localized_name('', 'department_name')).values('name').annotate(
+        count=Count('doctor_id', distinct=True)).order_by('-count', 'name').values_list('name', 'count')
+
+    return {
+        'specialty': [{'id': pk, 'name': name, 'count': count} for pk, name, count in specialties],
+        'department': [{'name': name, 'count': count} for name, count in departments],
+        'working_day': {day: totals[f'day_{day}'] for day in DoctorProfile.DAY_BITS},
+        'gender': {'true': totals['gender_true'], 'false': totals['gender_false']},
+        'experience': [{'min': low, 'max': high, 'count': totals[f'experience_{low}']}
+                       for low, high in EXPERIENCE_BUCKETS],
+        'rating': [{'min': low, 'count': totals[f'rating_{low}']} for low in RATING_BUCKETS],
+    }
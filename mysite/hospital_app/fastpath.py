@@ -0,0 +1,85 @@
+from operator import attrgetter
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.manager import BaseManager
+from rest_framework import serializers
+from rest_framework.relations import PKOnlyObject
+
+
+def simple_getter(serializer, field):
+    """attrgetter for a field backed by one concrete, non-relational column; None when DRF's lookup is needed."""
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None or len(field.source_attrs) != 1:
+        return None
+    try:
+        model_field = model._meta.get_field(field.source_attrs[0])
+    except FieldDoesNotExist:
+        return None
+    if not model_field.concrete or model_field.is_relation:
+        return None
+    return attrgetter(field.source_attrs[0])
+
+
+def compile_serializer(serializer):
+    """
+    Turn a bound serializer into a plain function `instance -> dict`.
+
+    The field walk, attribute lookups and nested serializers are resolved
+    once per request instead of once per row, and datetime fields resolve the
+    active time zone once. Values still go through each field's own
+    to_representation(), so the output matches the serializer.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        child = compile_serializer(serializer.child)
+
+        def represent_many(value):
+            return [child(item) for item in (value.all() if isinstance(value, BaseManager) else value)]
+        return represent_many
+
+    plan = []
+    for field in serializer._readable_fields:
+        if isinstance(field, serializers.BaseSerializer):
+            represent = compile_serializer(field)
+        else:
+            represent = field.to_representation
+            if isinstance(field, serializers.DateTimeField) and not hasattr(field, 'timezone'):
+                field.timezone = field.default_timezone()
+        getter = simple_getter(serializer, field)
+        plan.append((field.field_name, getter or field.get_attribute, represent, getter is None))
+
+    def represent_one(instance):
+        row = {}
+        for name, get, represent, checked in plan:
+            try:
+                attribute = get(instance)
+            except serializers.SkipField:
+                continue
+            if checked and isinstance(attribute, PKOnlyObject):
+                row[name] = None if attribute.pk is None else represent(attribute)
+            else:
+                row[name] = None if attribute is None else represent(attribute)
+        return row
+    return represent_one
+
+
+class FastListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        represent = compile_serializer(self.child)
+        return [represent(item) for item in (data.all() if isinstance(data, BaseManager) else data)]
+
+
+def fast_serializers_enabled(request):
+    return getattr(settings, 'FAST_READ_SERIALIZERS', True) and \
+        request.query_params.get('fast', '').lower() not in ('0', 'false', 'no')
+
+
+class FastListMixin:
+    """Serialize list pages with compile_serializer(); disable with FAST_READ_SERIALIZERS or ?fast=false."""
+
+    def get_serializer(self, *args, **kwargs):
+        if not kwargs.pop('many', False):
+            return super().get_serializer(*args, **kwargs)
+        if not fast_serializers_enabled(self.request):
+            return super().get_serializer(*args, many=True, **kwargs)
+        kwargs.setdefault('context', self.get_serializer_context())
+        return FastListSerializer(*args, child=self.get_serializer_class()(context=kwargs['context']), **kwargs)
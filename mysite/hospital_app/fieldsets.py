@@ -0,0 +1,141 @@
+import copy
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def parse_field_paths(value):
+    """'id,doctor.first_name' -> {'id': {}, 'doctor': {'first_name': {}}}"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def flag(request, name):
+    return request.query_params.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def sparse_requested(request):
+    return bool(request.query_params.get('fields') or request.query_params.get('expand') or flag(request, 'compact'))
+
+
+def restrict_fields(serializer, tree):
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    if not isinstance(serializer, serializers.BaseSerializer):
+        return
+    for name in list(serializer.fields):
+        if name not in tree:
+            serializer.fields.pop(name)
+        elif tree[name]:
+            restrict_fields(serializer.fields[name], tree[name])
+
+
+class SparseFieldsMixin:
+    """
+    Per-request field selection for the outermost serializer.
+
+    `?fields=id,doctor.first_name` keeps only the listed fields (dotted
+    paths select inside nested serializers), `?expand=name` adds optional
+    fields from `expandable_fields`, and `?compact=true` renders nested
+    objects as primary keys unless they are expanded. `sparse_sources`
+    maps fields that are not plain model attributes to the model fields
+    they read, so the view can trim its queryset to match.
+    """
+    expandable_fields = {}
+    sparse_sources = {}
+
+    def is_outermost(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or not self.is_outermost() or not sparse_requested(request):
+            return fields
+
+        expand = parse_field_paths(request.query_params.get('expand', ''))
+        for name in expand:
+            if name in self.expandable_fields:
+                fields[name] = copy.deepcopy(self.expandable_fields[name])
+        if flag(request, 'compact'):
+            for name, field in list(fields.items()):
+                nested = field.child if isinstance(field, serializers.ListSerializer) else field
+                if isinstance(nested, serializers.BaseSerializer) and name not in expand:
+                    fields[name] = serializers.PrimaryKeyRelatedField(
+                        read_only=True, many=isinstance(field, serializers.ListSerializer), source=field.source)
+
+        selected = parse_field_paths(request.query_params.get('fields', ''))
+        if selected:
+            fields = {name: field for name, field in fields.items() if name in selected or name in expand}
+            for name, field in fields.items():
+                if selected.get(name):
+                    restrict_fields(field, selected[name])
+        return fields
+
+
+def sparse_queryset(queryset, serializer, required=()):
+    """
+    Trim only()/select_related()/prefetch_related() of `queryset` to what `serializer` reads.
+
+    Relations rendered as primary keys need only their foreign key column.
+    The queryset is returned unchanged when a field's model source is unknown.
+    """
+    model = queryset.model
+    only, relations = {model._meta.pk.name, *required}, set()
+    for name, field in serializer.fields.items():
+        paths = serializer.sparse_sources.get(name, getattr(field, 'sparse_sources', None))
+        if paths is None:
+            if field.source == '*':
+                return queryset
+            paths = [field.source.replace('.', '__')]
+        pk_only = isinstance(field, (serializers.PrimaryKeyRelatedField, serializers.ManyRelatedField))
+        for path in paths:
+            first = path.split('__')[0]
+            try:
+                model_field = model._meta.get_field(first)
+            except FieldDoesNotExist:
+                return queryset
+            if model_field.concrete:
+                only.add(first)
+            if model_field.is_relation and not (model_field.concrete and pk_only):
+                relations.add(first)
+
+    queryset = queryset.only(*only)
+    select = queryset.query.select_related
+    if isinstance(select, dict):
+        paths = []
+        stack = [('', select)]
+        while stack:
+            prefix, tree = stack.pop()
+            for key, subtree in tree.items():
+                if not prefix and key not in relations:
+                    continue
+                if subtree:
+                    stack.append((f'{prefix}{key}__', subtree))
+                else:
+                    paths.append(f'{prefix}{key}')
+        queryset = queryset.select_related(None).select_related(*paths) if paths else queryset.select_related(None)
+    lookups = [lookup for lookup in queryset._prefetch_related_lookups
+               if getattr(lookup, 'prefetch_to', lookup).split('__')[0] in relations]
+    return queryset.prefetch_related(None).prefetch_related(*lookups)
+
+
+class SparseQuerysetMixin:
+    """Shrink the view's queryset to the fields requested with ?fields=/?expand=/?compact=."""
+
+    def get_sparse_required_fields(self):
+        ordering = getattr(self.paginator, 'ordering', None)
+        if isinstance(ordering, (list, tuple)):
+            return [field.lstrip('-') for field in ordering]
+        return []
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not sparse_requested(self.request):
+            return queryset
+        return sparse_queryset(queryset, self.get_serializer(), self.get_sparse_required_fields())
@@ -1,10 +1,61 @@
-from django_filters import FilterSet
+from django.db.models import Case, F, Q, When
+from django_filters import BaseInFilter, BooleanFilter, CharFilter, FilterSet, NumberFilter
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
 from .models import DoctorProfile
+from .search import query_terms, search_doctors
+
+
+class NumberInFilter(BaseInFilter, NumberFilter):
+    pass
+
+
+class CharInFilter(BaseInFilter, CharFilter):
+    pass
+
 
 class DoctorProfileFilter(FilterSet):
+    specialty = NumberInFilter(field_name='specialty', distinct=True)
+    department = CharInFilter(field_name='department__department_name', distinct=True)
+    working_day = CharFilter(method='filter_working_day')
+    gender = BooleanFilter()
+    experience_min = NumberFilter(field_name='experience', lookup_expr='gte')
+    experience_max = NumberFilter(field_name='experience', lookup_expr='lte')
+    rating_min = NumberFilter(field_name='avg_rating', lookup_expr='gte')
+    rating_max = NumberFilter(field_name='avg_rating', lookup_expr='lte')
+
     class Meta:
         model = DoctorProfile
         fields = {
 
             'price': ['gt', 'lt']
-        }
\ No newline at end of file
+        }
+
+    def filter_working_day(self, queryset, name, value):
+        days = {day.strip().capitalize() for day in value.split(',') if day.strip()}
+        if not days or not days <= DoctorProfile.DAY_BITS.keys():
+            # Nobody works on a day outside DAY_CHOICES (Sunday included); a zero mask would match everyone
+            return queryset.none()
+        mask = DoctorProfile.days_to_mask(days)
+        return queryset.alias(day_bits=F('working_days_mask').bitand(mask)).filter(day_bits=mask)
+
+
+class DoctorSearchFilter(BaseFilterBackend):
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query_terms(query):
+            return queryset
+
+        doctor_ids = search_doctors(query, queryset)
+        if doctor_ids is None:
+            return queryset.filter(
+                Q(first_name__icontains=query) | Q(last_name__icontains=query)
+                | Q(specialty__specialty_name__icontains=query) | Q(department__department_name__icontains=query)
+                | Q(doctor_information__icontains=query)).distinct()
+
+        queryset = queryset.filter(pk__in=doctor_ids)
+        if doctor_ids and not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by(Case(*[When(pk=pk, then=rank) for rank, pk in enumerate(doctor_ids)]))
+        return queryset
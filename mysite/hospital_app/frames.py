@@ -0,0 +1,50 @@
+import json
+from collections import OrderedDict
+import msgpack
+
+MSGPACK_SUBPROTOCOL = 'msgpack'
+
+
+def encode_text(payload):
+    return json.dumps(payload)
+
+
+def encode_binary(payload):
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def decode(text_data=None, bytes_data=None):
+    if bytes_data is not None:
+        return msgpack.unpackb(bytes_data, raw=False)
+    return json.loads(text_data)
+
+
+class FrameCache:
+    """
+    Frames of the latest group events, keyed by event id and framing.
+
+    A group event carries only its payload and id through the channel
+    layer; the first consumer of this process to send it encodes it for its
+    framing and the room's other consumers reuse that frame. Framings no
+    consumer here uses are never encoded. Only the last `size` frames are
+    kept, as every member receives an event within moments of the others.
+    """
+
+    def __init__(self, size=256):
+        self.size = size
+        self.frames = OrderedDict()
+
+    def get(self, event_id, payload, binary):
+        encode = encode_binary if binary else encode_text
+        if event_id is None:
+            return encode(payload)
+        key = (event_id, binary)
+        frame = self.frames.get(key)
+        if frame is None:
+            frame = self.frames[key] = encode(payload)
+            if len(self.frames) > self.size:
+                self.frames.popitem(last=False)
+        return frame
+
+
+frame_cache = FrameCache()
@@ -0,0 +1,59 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from PASSWORD_PBKDF2_ITERATIONS.
+
+    It keeps the `pbkdf2_sha256` algorithm name, so existing hashes still
+    verify and Django rewrites them with the configured count on the next
+    successful login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+_pool = None
+
+
+def get_pool():
+    """
+    One process pool per process, created on first use and reused by
+    every batch. Workers are spawned, not forked, so a threaded web server
+    never forks with locks held.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(settings.PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+                                    initializer=django.setup)
+    return _pool
+
+
+def hash_passwords(passwords):
+    """
+    make_password() for a list of raw passwords, keeping the order.
+
+    Large batches are spread over the PASSWORD_HASH_WORKERS process pool so
+    bulk imports are not bound to one core; empty passwords become
+    unusable ones. Call it outside transactions: hashing takes long.
+    """
+    global _pool
+    workers = settings.PASSWORD_HASH_WORKERS
+    raw = [password for password in passwords if password]
+    if workers > 1 and len(raw) >= settings.PASSWORD_HASH_POOL_MIN:
+        chunksize = max(1, len(raw) // (workers * 4))
+        try:
+            hashed = iter(list(get_pool().map(make_password, raw, chunksize=chunksize)))
+        except BrokenProcessPool:
+            _pool = None
+            hashed = iter(list(get_pool().map(make_password, raw, chunksize=chunksize)))
+    else:
+        hashed = map(make_password, raw)
+    return [next(hashed) if password else make_password(None) for password in passwords]
@@ -0,0 +1,176 @@
+import io
+import logging
+import multiprocessing
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+from rest_framework import serializers
+from .caching import invalidate
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+def variants_field(field_name):
+    return f'{field_name}_variants'
+
+
+def variant_path(name, size, extension):
+    return posixpath.join('variants', posixpath.splitext(name)[0], f'{size}.{extension}')
+
+
+def encode(image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, quality=settings.IMAGE_VARIANT_QUALITY, optimize=image_format == 'JPEG')
+    return buffer.getvalue()
+
+
+def render_variants(name, storage=default_storage):
+    """
+    Resize the stored image `name` to every IMAGE_VARIANT_SIZES bounding box
+    in every IMAGE_VARIANT_FORMATS format, save the files next to each other
+    under variants/ and return the manifest kept on the row.
+    """
+    with storage.open(name) as original:
+        image = Image.open(original)
+        image.seek(0)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    sizes = {}
+    for size, box in settings.IMAGE_VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((box, box), Image.Resampling.LANCZOS)
+        entry = sizes[size] = {'width': resized.width, 'height': resized.height}
+        for extension in settings.IMAGE_VARIANT_FORMATS:
+            path = variant_path(name, size, extension)
+            storage.delete(path)
+            entry[extension] = storage.save(path, ContentFile(encode(resized, FORMATS[extension])))
+    return {'source': name, 'sizes': sizes}
+
+
+def store_variants(model_label, pk, field_name, name, variants):
+    """Save the manifest on the row unless its image changed meanwhile, and refresh cached doctor responses."""
+    updated = apps.get_model(model_label)._default_manager.filter(pk=pk, **{field_name: name}).update(
+        **{variants_field(field_name): variants})
+    if updated and model_label == 'hospital_app.UserProfile':
+        invalidate('doctors', f'doctor:{pk}')
+    return updated
+
+
+def build_variants(model_label, pk, field_name, name):
+    return store_variants(model_label, pk, field_name, name, render_variants(name))
+
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(settings.IMAGE_VARIANT_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+                                    initializer=django.setup)
+    return _pool
+
+
+def submit(model_label, pk, field_name, name):
+    """
+    Render in the process pool (IMAGE_VARIANT_WORKERS), then store the
+    manifest from this process, whose cache the invalidation must reach.
+    With no workers, everything runs inline.
+    """
+    if not settings.IMAGE_VARIANT_WORKERS:
+        try:
+            build_variants(model_label, pk, field_name, name)
+        except Exception:
+            logger.exception('Could not build image variants of %s', name)
+        return
+
+    def done(future):
+        try:
+            store_variants(model_label, pk, field_name, name, future.result())
+        except Exception:
+            logger.exception('Could not build image variants of %s', name)
+    global _pool
+    try:
+        future = get_pool().submit(render_variants, name)
+    except BrokenProcessPool:
+        _pool = None
+        future = get_pool().submit(render_variants, name)
+    future.add_done_callback(done)
+
+
+def needs_variants(instance, field_name, force=False):
+    name = getattr(instance, field_name).name
+    variants = getattr(instance, variants_field(field_name))
+    return bool(name) and (force or not variants or variants.get('source') != name)
+
+
+def clear_stale_variants(instance, field_name):
+    """Drop a manifest left from a replaced or removed image, unless the row already has one for its image."""
+    name = getattr(instance, field_name).name or ''
+    variants = getattr(instance, variants_field(field_name))
+    if not variants or variants.get('source') == name:
+        return
+    model = instance._meta.get_field(field_name).model
+    stale = model._default_manager.filter(pk=instance.pk, **{field_name: name})
+    if name:
+        stale = stale.exclude(**{f'{variants_field(field_name)}__source': name})
+    stale.update(**{variants_field(field_name): None})
+    setattr(instance, variants_field(field_name), None)
+
+
+def schedule_variants(instance, field_name):
+    """Build variants in the background once the transaction that stored a new image commits."""
+    clear_stale_variants(instance, field_name)
+    if needs_variants(instance, field_name):
+        name = getattr(instance, field_name).name
+        label = instance._meta.get_field(field_name).model._meta.label
+        transaction.on_commit(lambda: submit(label, instance.pk, field_name, name), robust=True)
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Variant manifest as {size: {width, height, webp: url, jpeg: url}}; null until the variants of the current
+    image exist. Reads the whole instance, so a manifest built for a previous image is never returned.
+    """
+
+    def __init__(self, image_field=None, **kwargs):
+        kwargs['read_only'] = True
+        kwargs['source'] = '*'
+        self.image_field = image_field
+        super().__init__(**kwargs)
+
+    def bind(self, field_name, parent):
+        super().bind(field_name, parent)
+        if self.image_field is None:
+            self.image_field = field_name.removesuffix('_variants')
+        self.sparse_sources = [self.image_field, variants_field(self.image_field)]
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        value = getattr(instance, variants_field(self.image_field))
+        if not value or not image or value.get('source') != image.name:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for size, entry in value['sizes'].items():
+            urls[size] = dict(entry)
+            for extension in FORMATS:
+                if extension in entry:
+                    url = default_storage.url(entry[extension])
+                    urls[size][extension] = request.build_absolute_uri(url) if request is not None else url
+        return urls
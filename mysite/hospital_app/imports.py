@@ -0,0 +1,139 @@
+import csv
+import io
+import json
+import re
+from itertools import islice
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework.settings import api_settings
+from .models import Specialty
+from .search import localized
+from .serializers import DoctorProfileBulkSerializer
+
+IMPORT_FORMATS = ('csv', 'json', 'ndjson')
+NAME_SEPARATOR = re.compile(r'\s*[|;]\s*')
+DAY_SEPARATOR = re.compile(r'\s*[|;,]\s*')
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower()
+    return {'jsonl': 'ndjson'}.get(extension, extension)
+
+
+def read_records(stream, file_format):
+    """Yield one dict per doctor; CSV and NDJSON are read line by line, a JSON array is loaded whole."""
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+    elif file_format == 'ndjson':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        yield from json.load(stream)
+
+
+def split_names(value, separator=NAME_SEPARATOR):
+    if isinstance(value, str):
+        return [name for name in separator.split(value.strip()) if name]
+    return list(value or [])
+
+
+class SpecialtyMap:
+    """Specialty ids by name (any language, case-insensitive), loaded once; unknown names are bulk-created."""
+
+    def __init__(self):
+        self.ids = {}
+        for pk, *names in Specialty.objects.values_list('pk', *localized('specialty_name')):
+            for name in names:
+                if name:
+                    self.ids.setdefault(name.casefold(), pk)
+
+    def resolve(self, names_per_row):
+        missing = {}
+        for names in names_per_row:
+            for name in names:
+                if name.casefold() not in self.ids:
+                    missing.setdefault(name.casefold(), name)
+        if missing:
+            for specialty in Specialty.objects.bulk_create([Specialty(specialty_name=name)
+                                                            for name in missing.values()]):
+                self.ids[specialty.specialty_name.casefold()] = specialty.pk
+        return [[self.ids[name.casefold()] for name in names] for names in names_per_row]
+
+
+class DoctorImporter:
+    """
+    Import doctors with their departments and specialties in chunks.
+
+    Each chunk is validated by DoctorProfileBulkSerializer (one query per
+    check, not per row), its passwords are hashed, and it is written with a
+    fixed number of bulk queries in its own transaction. Invalid rows, and
+    rows that still collide on write, are skipped and reported by their
+    1-based row number.
+    """
+
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size or getattr(settings, 'IMPORT_CHUNK_SIZE', 500)
+        self.specialties = SpecialtyMap()
+        self.created = 0
+        self.errors = []
+
+    def run(self, records):
+        records = iter(records)
+        offset = 0
+        while chunk := list(islice(records, self.chunk_size)):
+            self.import_chunk(chunk, offset)
+            offset += len(chunk)
+        return {'created': self.created, 'errors': self.errors}
+
+    def prepare(self, record):
+        if not isinstance(record, dict):
+            return record, []
+        row = {key: value for key, value in record.items() if key and value not in ('', None)}
+        names = split_names(row.pop('specialties', []))
+        if 'departments' in row:
+            row['department'] = split_names(row.pop('departments'))
+        if 'working_days' in row:
+            row['working_days'] = split_names(row['working_days'], DAY_SEPARATOR)
+        return row, names
+
+    def import_chunk(self, records, offset):
+        rows, names = zip(*[self.prepare(record) for record in records])
+        serializer = DoctorProfileBulkSerializer(data=list(rows), many=True)
+        prepared = serializer.is_valid()
+        valid = []
+        for index, (item, errors) in enumerate(zip(serializer.items, serializer.item_errors)):
+            if errors:
+                self.errors.append({'row': offset + index + 1, 'errors': errors})
+            else:
+                valid.append((offset + index + 1, item, names[index]))
+        if not valid:
+            return
+        # Hashing and new specialties come before the transaction, which then only holds the doctor inserts;
+        # is_valid() has hashed a batch without errors already
+        if not prepared:
+            serializer.child.prepare_batch([item for _, item, _ in valid])
+        specialty_ids = self.specialties.resolve([row_names for _, _, row_names in valid])
+        for (_, item, _), ids in zip(valid, specialty_ids):
+            item['specialty'] = ids
+        try:
+            self.write(serializer.child, [item for _, item, _ in valid])
+        except IntegrityError:
+            # A row taken since validation, e.g. a username from a concurrent import: retry one by one
+            for row, item, _ in valid:
+                try:
+                    self.write(serializer.child, [item])
+                except IntegrityError as exc:
+                    self.errors.append({'row': row, 'errors': {api_settings.NON_FIELD_ERRORS_KEY: [str(exc)]}})
+
+    def write(self, child, items):
+        with transaction.atomic():
+            child.bulk_create([dict(item) for item in items])
+        self.created += len(items)
+
+def import_doctors(binary_file, file_format, chunk_size=None):
+    stream = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    try:
+        return DoctorImporter(chunk_size).run(read_records(stream, file_format))
+    finally:
+        stream.detach()
@@ -0,0 +1,85 @@
+import asyncio
+import statistics
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from django.utils import translation
+from rest_framework_simplejwt.tokens import AccessToken
+from hospital_app.models import DoctorProfile, UserProfile
+
+ENDPOINTS = {
+    'doctors': ('doctors_list', 'async_doctors_list'),
+    'doctor': ('doctor_detail', 'async_doctor_detail'),
+    'appointments': ('appointment_list', 'async_appointment_list'),
+    'feedbacks': ('feedbacks_list', 'async_feedbacks_list'),
+}
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = ('Compare requests per second and latency of the sync and async read endpoints under concurrent load, '
+            'through the ASGI handler, on existing rows (read only)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoints', nargs='*', help=f'Any of {", ".join(ENDPOINTS)}; all by default')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and path')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--query', default='', help='Query string sent with every request, e.g. "page_size=5"')
+        parser.add_argument('--user', help='Username to authenticate as; required for feedbacks')
+        parser.add_argument('--cache', action='store_true', help='Keep the response cache of the sync catalog views')
+
+    def handle(self, *args, **options):
+        unknown = set(options['endpoints']) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+        names = options['endpoints'] or list(ENDPOINTS)
+        headers = {}
+        if options['user']:
+            user = UserProfile.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'No user {options["user"]!r}')
+            headers['Authorization'] = f'Bearer {AccessToken.for_user(user)}'
+        elif 'feedbacks' in names:
+            if options['endpoints']:
+                raise CommandError('feedbacks needs --user')
+            names.remove('feedbacks')
+        doctor = DoctorProfile.objects.order_by('pk').values_list('pk', flat=True).first()
+
+        with translation.override(settings.LANGUAGE_CODE), override_settings(
+                **({} if options['cache'] else {'CACHES': NO_CACHE})):
+            for name in names:
+                kwargs = {'pk': doctor} if name == 'doctor' else {}
+                if name == 'doctor' and doctor is None:
+                    self.stdout.write(f'{name:14} no rows')
+                    continue
+                results = {}
+                for path, url_name in zip(('sync', 'async'), ENDPOINTS[name]):
+                    url = reverse(url_name, kwargs=kwargs) + (f'?{options["query"]}' if options['query'] else '')
+                    results[path] = asyncio.run(self.load(url, headers, options['requests'], options['concurrency']))
+                for path, (rate, p50, p99) in results.items():
+                    self.stdout.write(f'{name:14} {path:6} {rate:>9,.0f} req/s   p50 {p50 * 1000:>8.1f} ms'
+                                      f'   p99 {p99 * 1000:>8.1f} ms')
+                self.stdout.write(f'{name:14} async/sync x{results["async"][0] / results["sync"][0]:.2f}')
+
+    async def load(self, url, headers, total, concurrency):
+        client = AsyncClient()
+        latencies = []
+        pending = iter(range(total))
+
+        async def worker():
+            for _ in pending:
+                started = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code}: {response.content[:200]!r}')
+
+        await client.get(url, headers=headers)
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(max(concurrency, 1))])
+        elapsed = time.perf_counter() - started
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        return total / elapsed, percentiles[49], percentiles[98]
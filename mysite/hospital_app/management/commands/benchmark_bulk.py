@@ -0,0 +1,81 @@
+import datetime
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework.test import APIClient
+from hospital_app.management.scratch import scratch_database
+from hospital_app.models import DoctorProfile, PatientProfile, UserProfile
+
+ENDPOINTS = ('appointments', 'medical_records', 'doctors')
+
+
+class Command(BaseCommand):
+    help = ('Seed a scratch database and compare items per second of the bulk endpoints with writing the same '
+            'items one request at a time')
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoints', nargs='*', help=f'Any of {", ".join(ENDPOINTS)}; all by default')
+        parser.add_argument('--items', type=int, default=1000, help='Items written by each path')
+
+    def handle(self, *args, **options):
+        unknown = set(options['endpoints']) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+        with scratch_database():
+            client = APIClient()
+            client.force_authenticate(UserProfile.objects.create_user(username='bulk-staff', is_staff=True))
+            doctors = [DoctorProfile.objects.create_user(
+                username=f'bulk-doctor-{number}', shift_start=datetime.time(9), shift_end=datetime.time(17),
+                working_days=['Monday'], price=100) for number in range(10)]
+            patients = [PatientProfile.objects.create(
+                user=UserProfile.objects.create_user(username=f'bulk-patient-{number}'),
+                emergency_contact='+10000000000', blood_type='A') for number in range(10)]
+            for name in options['endpoints'] or ENDPOINTS:
+                self.compare(client, name, *getattr(self, name)(doctors, patients), options['items'])
+
+    def compare(self, client, name, single_url, bulk_url, make, count):
+        results = {}
+        for path in ('single', 'bulk'):
+            items = [make(f'{path}-{number}', number + (count if path == 'bulk' else 0)) for number in range(count)]
+            started = time.perf_counter()
+            if path == 'single':
+                for item in items:
+                    self.post(client, single_url, [item] if single_url == bulk_url else item)
+            else:
+                size = settings.BULK_MAX_ITEMS
+                for start in range(0, count, size):
+                    self.post(client, bulk_url, items[start:start + size])
+            results[path] = count / (time.perf_counter() - started)
+        self.stdout.write(f'{name:16} single {results["single"]:>9,.0f} items/s   bulk {results["bulk"]:>9,.0f} items/s'
+                          f'   x{results["bulk"] / results["single"]:.1f}')
+
+    def post(self, client, url, data):
+        response = client.post(url, data, format='json')
+        if response.status_code != 201:
+            raise CommandError(f'{url} answered {response.status_code}: {str(response.data)[:300]}')
+
+    def appointments(self, doctors, patients):
+        start = datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc)
+
+        def make(key, number):
+            return {'patient': patients[number % len(patients)].pk, 'doctor': doctors[number % len(doctors)].pk,
+                    'date_time': (start + datetime.timedelta(minutes=30 * number)).isoformat(), 'status': 'planned'}
+        return reverse('appointment_create'), reverse('appointment_bulk'), make
+
+    def medical_records(self, doctors, patients):
+        # MedicalRecordCreateAPIView cannot write its nested patient/doctor, so the single path posts
+        # one-item arrays: one request and one transaction per item, with the same validation.
+        def make(key, number):
+            return {'patient': patients[number % len(patients)].pk, 'doctor': doctors[number % len(doctors)].pk,
+                    'diagnosis': f'Diagnosis {key}', 'treatment': 'Rest', 'prescribed_medication': 'Water',
+                    'created_at': '2030-01-01'}
+        return reverse('medical_record_bulk'), reverse('medical_record_bulk'), make
+
+    def doctors(self, doctors, patients):
+        # Same for DoctorProfileCreateAPIView, whose serializer rejects working_days given as a list.
+        def make(key, number):
+            return {'username': f'bulk-new-{key}', 'first_name': 'New', 'last_name': f'Doctor {number}',
+                    'shift_start': '09:00', 'shift_end': '17:00', 'working_days': ['Monday', 'Friday'],
+                    'price': 100 + number % 50}
+        return reverse('doctor_bulk'), reverse('doctor_bulk'), make
@@ -0,0 +1,113 @@
+import asyncio
+import datetime
+import time
+import tracemalloc
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from hospital_app.exports import EXPORT_FORMATS
+from hospital_app.management.scratch import scratch_database
+from hospital_app.models import DoctorProfile, MedicalRecord, PatientProfile, UserProfile
+
+
+class Command(BaseCommand):
+    help = ('Seed a scratch database with synthetic medical records and measure the peak Python memory of '
+            'streaming their export through the WSGI and the ASGI request path')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--max-peak-mb', type=float,
+                            help='Fail if either path peaks above this many MB (e.g. in CI)')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            token = self.seed(options['rows'])
+            url = f'{reverse("medical_records_list")}?export={options["format"]}'
+            results = {'wsgi': self.measure(self.wsgi, url, token), 'asgi': self.measure(self.asgi, url, token)}
+        for path, (elapsed, size, lines, peak) in results.items():
+            exported = lines - (options['format'] == 'csv')
+            self.stdout.write(f'{path}  {exported:>9,} rows  {size / 1024 ** 2:>8.1f} MB sent  in {elapsed:6.1f}s'
+                              f'   peak memory {peak / 1024 ** 2:6.1f} MB')
+            if exported != options['rows']:
+                raise CommandError(f'{path} exported {exported} rows of {options["rows"]}')
+            if options['max_peak_mb'] is not None and peak > options['max_peak_mb'] * 1024 ** 2:
+                raise CommandError(f'{path} peaked at {peak / 1024 ** 2:.1f} MB')
+
+    def seed(self, rows):
+        staff = UserProfile.objects.create_user(username='export-staff', is_staff=True)
+        doctor = DoctorProfile.objects.create_user(username='export-doctor', first_name='Doctor', last_name='Export',
+                                                   shift_start=datetime.time(9), shift_end=datetime.time(17),
+                                                   price=100)
+        user = UserProfile.objects.create_user(username='export-patient', first_name='Patient', last_name='Export')
+        patient = PatientProfile.objects.create(user=user, emergency_contact='+10000000000', blood_type='A')
+        created = datetime.date(2024, 1, 1)
+        for start in range(0, rows, 10000):
+            MedicalRecord.objects.bulk_create(
+                MedicalRecord(patient=patient, doctor=doctor, diagnosis=f'Diagnosis number {number}',
+                              treatment='Rest, fluids and a follow-up visit in two weeks',
+                              prescribed_medication='Paracetamol 500 mg',
+                              created_at=created + datetime.timedelta(days=number % 365))
+                for number in range(start, min(start + 10000, rows)))
+        return str(AccessToken.for_user(staff))
+
+    def measure(self, consume, url, token):
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            size, lines = consume(url, token)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return elapsed, size, lines, peak
+
+    def wsgi(self, url, token):
+        response = Client().get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+        size = lines = 0
+        for part in response.streaming_content:
+            size += len(part)
+            lines += part.count(b'\n')
+        return size, lines
+
+    def asgi(self, url, token):
+        """Drive Django's ASGI handler as Daphne does, counting the body as it is sent."""
+        application = get_asgi_application()
+        path, _, query = url.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        sent = {'size': 0, 'lines': 0, 'status': None}
+
+        async def run():
+            finished = asyncio.Event()
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    sent['status'] = message['status']
+                elif message['type'] == 'http.response.body':
+                    sent['size'] += len(message.get('body', b''))
+                    sent['lines'] += message.get('body', b'').count(b'\n')
+                    if not message.get('more_body'):
+                        finished.set()
+
+            await application(scope, receive, send)
+
+        asyncio.run(run())
+        if sent['status'] != 200:
+            raise CommandError(f'ASGI export answered {sent["status"]}')
+        return sent['size'], sent['lines']
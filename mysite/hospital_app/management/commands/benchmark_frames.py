@@ -0,0 +1,83 @@
+import time
+import uuid
+import zlib
+from channels_redis.core import RedisChannelLayer
+from django.core.management.base import BaseCommand, CommandError
+from hospital_app.frames import FrameCache, decode, encode_binary, encode_text
+
+PAYLOADS = {
+    'short text': {'message': 'See you at 10:30 tomorrow.'},
+    'long text': {'message': 'Take one tablet twice a day after meals and call me if the fever comes back. ' * 12},
+    'attachment': {'attachment': {
+        'id': 123456, 'chat': 789, 'author': {'id': 4321, 'first_name': 'Aigerim', 'last_name': 'Sadykova'},
+        'text': None, 'image': '/media/images/scan_2030_01_07.jpg',
+        'image_variants': {str(size): {'url': f'/media/images/variants/scan_2030_01_07_{size}.webp',
+                                       'width': size, 'height': size * 3 // 4} for size in (160, 480, 1280)},
+        'video': None, 'created_date': '2030-01-07T10:30:00.123456Z',
+    }},
+}
+
+
+def deflated_size(frame):
+    """Size of the frame under permessage-deflate without context takeover (raw deflate, trailer stripped)."""
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    data = compressor.compress(frame.encode() if isinstance(frame, str) else frame)
+    data += compressor.flush(zlib.Z_SYNC_FLUSH)
+    return len(data) - 4
+
+
+def layer_bytes(event, channel_names):
+    """Bytes channels_redis writes to Redis for one group_send of `event` to `channel_names`."""
+    layer = RedisChannelLayer()
+    _, messages, _ = layer._map_channel_keys_to_connection(channel_names, {'type': 'chat.message', **event})
+    return sum(len(message) for message in messages.values())
+
+
+class Command(BaseCommand):
+    help = ('Compare the JSON and msgpack chat framings: encode cost of one group fan-out, decode cost, bytes '
+            'on the wire with and without per-message deflate, and bytes through the channel layer')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=200, help='Consumers in the room receiving each event')
+        parser.add_argument('--events', type=int, default=2000, help='Events sent per measurement')
+        parser.add_argument('--processes', type=int, default=4, help='Server processes the members are spread over')
+
+    def handle(self, *args, **options):
+        members, events, processes = options['members'], options['events'], options['processes']
+        self.stdout.write(f'{events:,} events to a room of {members} members over {processes} processes')
+        # Channel names as channels_redis hands them out: one Redis key per process
+        channel_names = [f'specific.{number % processes:032x}!{number:012x}' for number in range(members)]
+        for name, payload in PAYLOADS.items():
+            text, binary = encode_text(payload), encode_binary(payload)
+            if not decode(text_data=text) == decode(bytes_data=binary) == payload:
+                raise CommandError(f'{name}: the framings do not round-trip')
+            self.stdout.write(f'\n{name}')
+            self.stdout.write(f'  bytes per frame   json {len(text.encode()):>6}   msgpack {len(binary):>6}   '
+                              f'json+deflate {deflated_size(text):>6}   msgpack+deflate {deflated_size(binary):>6}')
+            event = {'id': uuid.uuid4().hex, **payload}
+            every_framing = {**event, 'text': text, 'binary': binary}
+            self.stdout.write(f'  channel layer     payload {layer_bytes(event, channel_names):>6}   '
+                              f'payload+json+msgpack {layer_bytes(every_framing, channel_names):>6}   '
+                              f'bytes per fan-out')
+            per_member = {
+                'json per member': lambda: [encode_text(payload) for _ in range(members)],
+                'msgpack per member': lambda: [encode_binary(payload) for _ in range(members)],
+                'frame cache': lambda: self.fan_out(payload, members),
+            }
+            for label, fan_out in per_member.items():
+                started = time.perf_counter()
+                for _ in range(events):
+                    fan_out()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'  {label:19} {elapsed / events * 1e6:>9.1f} us per event')
+            for label, call in (('json decode', lambda: decode(text_data=text)),
+                                ('msgpack decode', lambda: decode(bytes_data=binary))):
+                started = time.perf_counter()
+                for _ in range(events):
+                    call()
+                self.stdout.write(f'  {label:19} {(time.perf_counter() - started) / events * 1e6:>9.1f} us per frame')
+
+    def fan_out(self, payload, members):
+        """Frames for one event as the consumers of a room get them: a fresh id, half the members on msgpack."""
+        cache, event_id = FrameCache(), uuid.uuid4().hex
+        return [cache.get(event_id, payload, number % 2 == 0) for number in range(members)]
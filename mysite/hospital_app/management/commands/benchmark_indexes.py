@@ -0,0 +1,131 @@
+import datetime
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from hospital_app.management.scratch import scratch_database
+from hospital_app.models import (Appointment, Chat, DoctorProfile, Feedback, MedicalRecord, Message, PatientProfile,
+                                 UserProfile)
+
+INDEXED_MODELS = (Appointment, MedicalRecord, Feedback, Message, DoctorProfile)
+
+
+class Command(BaseCommand):
+    help = ('Seed large synthetic tables in a scratch database and print the query plan and latency of each hot '
+            'query without and with the composite indexes of migration 0009')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000, help='Rows in each of the large tables')
+        parser.add_argument('--doctors', type=int, default=1000)
+        parser.add_argument('--patients', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=200, help='Runs of each query, with random keys')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            started = time.perf_counter()
+            keys = self.seed(options)
+            self.stdout.write(f'Seeded {options["rows"]:,} rows per table in {time.perf_counter() - started:.1f}s')
+            before = self.measure(keys, options, indexed=False)
+            after = self.measure(keys, options, indexed=True)
+            for name in self.queries(keys):
+                self.stdout.write(f'\n{name}')
+                for label, results in (('without', before), ('with', after)):
+                    plan, median, p95 = results[name]
+                    self.stdout.write(f'  {label:8} median {median:8.3f} ms   p95 {p95:8.3f} ms')
+                    for line in plan.splitlines():
+                        self.stdout.write(f'           {line}')
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        rows = options['rows']
+        doctors = DoctorProfile.objects.bulk_create_doctors([
+            DoctorProfile(username=f'index-doctor-{number}', first_name='Doctor', last_name=str(number),
+                          shift_start=datetime.time(9), shift_end=datetime.time(17), working_days=['Monday'],
+                          price=rng.randrange(50, 5000)) for number in range(options['doctors'])])
+        users = UserProfile.objects.bulk_create([UserProfile(username=f'index-patient-{number}')
+                                                 for number in range(options['patients'])], batch_size=2000)
+        patients = PatientProfile.objects.bulk_create([
+            PatientProfile(user=user, emergency_contact='+10000000000', blood_type='A') for user in users],
+            batch_size=2000)
+        chats = Chat.objects.bulk_create([Chat() for _ in range(max(rows // 200, 1))])
+        doctor_ids, patient_ids = [doctor.pk for doctor in doctors], [patient.pk for patient in patients]
+        start = datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc)
+        statuses = [status for status, _ in Appointment.APPOINTMENT_STATUS]
+
+        def moment(number):
+            return start + datetime.timedelta(minutes=30 * number)
+
+        # One row per (doctor, slot), so the unique_active_appointment constraint holds
+        Appointment.objects.bulk_create([
+            Appointment(doctor_id=doctor_ids[number % len(doctor_ids)], patient_id=rng.choice(patient_ids),
+                        date_time=moment(number // len(doctor_ids)), status=rng.choice(statuses))
+            for number in range(rows)], batch_size=2000)
+        MedicalRecord.objects.bulk_create([
+            MedicalRecord(doctor_id=rng.choice(doctor_ids), patient_id=rng.choice(patient_ids), diagnosis='Flu',
+                          treatment='Rest', prescribed_medication='Water',
+                          created_at=(start + datetime.timedelta(days=rng.randrange(3650))).date())
+            for _ in range(rows)], batch_size=2000)
+        Feedback.objects.bulk_create([
+            Feedback(doctor_id=rng.choice(doctor_ids), patient_id=rng.choice(patient_ids), rating=rng.randrange(1, 6),
+                     comment='Fine') for _ in range(rows)], batch_size=2000)
+        messages = Message.objects.bulk_create([
+            Message(chat=rng.choice(chats), author_id=rng.choice(patient_ids), text='Hello') for _ in range(rows)],
+            batch_size=2000)
+        # auto_now_add gives every row the same moment; spread them so ordering by date means something
+        for number, message in enumerate(messages):
+            message.created_date = moment(number)
+        Message.objects.bulk_update(messages, ['created_date'], batch_size=2000)
+        feedbacks = list(Feedback.objects.only('pk'))
+        for number, feedback in enumerate(feedbacks):
+            feedback.created_at = moment(number)
+        Feedback.objects.bulk_update(feedbacks, ['created_at'], batch_size=2000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE' if connection.vendor != 'postgresql' else 'VACUUM ANALYZE')
+        return {'doctors': doctor_ids, 'patients': patient_ids, 'chats': [chat.pk for chat in chats],
+                'start': start, 'rng': rng}
+
+    def queries(self, keys):
+        rng, start = keys['rng'], keys['start']
+        return {
+            'Appointment by doctor and date_time': lambda: Appointment.objects.filter(
+                doctor_id=rng.choice(keys['doctors']), date_time__gte=start + datetime.timedelta(days=30)
+            ).order_by('date_time')[:20],
+            'Appointment by patient and status': lambda: Appointment.objects.filter(
+                patient_id=rng.choice(keys['patients']), status='planned'),
+            'MedicalRecord by patient and created_at': lambda: MedicalRecord.objects.filter(
+                patient_id=rng.choice(keys['patients'])).order_by('-created_at')[:20],
+            'Feedback by doctor and created_at': lambda: Feedback.objects.filter(
+                doctor_id=rng.choice(keys['doctors'])).order_by('-created_at')[:20],
+            'Message by chat and created_date': lambda: Message.objects.filter(
+                chat_id=rng.choice(keys['chats'])).order_by('-created_date')[:50],
+            'DoctorProfile by price': lambda: DoctorProfile.objects.filter(
+                price__gte=rng.randrange(50, 5000)).order_by('price', 'pk').values_list('pk', flat=True)[:20],
+        }
+
+    def measure(self, keys, options, indexed):
+        self.set_indexes(indexed)
+        results = {}
+        for name, make in self.queries(keys).items():
+            plan = make().explain()
+            latencies = []
+            for _ in range(options['repeat']):
+                queryset = make()
+                started = time.perf_counter()
+                list(queryset)
+                latencies.append((time.perf_counter() - started) * 1000)
+            p95 = statistics.quantiles(latencies, n=20)[18] if len(latencies) > 1 else latencies[0]
+            results[name] = (plan, statistics.median(latencies), p95)
+        return results
+
+    def set_indexes(self, indexed):
+        with connection.schema_editor() as editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    if indexed:
+                        editor.add_index(model, index)
+                    else:
+                        editor.remove_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,66 @@
+import importlib.util
+import time
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from hospital_app.management.scratch import scratch_database
+from hospital_app.models import UserProfile
+
+PASSWORD = 'Shift-change-2030'
+DJANGO_PBKDF2 = 'django.contrib.auth.hashers.PBKDF2PasswordHasher'
+TUNED_PBKDF2 = 'hospital_app.hashers.TunedPBKDF2PasswordHasher'
+ARGON2 = 'django.contrib.auth.hashers.Argon2PasswordHasher'
+
+
+class Command(BaseCommand):
+    help = ('Seed users in a scratch database and measure logins per second on one core through the login view, '
+            'for each password hashing profile, plus repeated bad credentials')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--logins', type=int, default=100, help='Logins per profile')
+        parser.add_argument('--iterations', type=int, default=settings.PASSWORD_PBKDF2_ITERATIONS,
+                            help='PBKDF2 iterations of the "tuned" profile')
+
+    def handle(self, *args, **options):
+        profiles = {
+            'default': {'PASSWORD_HASHERS': [DJANGO_PBKDF2]},
+            'tuned': {'PASSWORD_HASHERS': [TUNED_PBKDF2], 'PASSWORD_PBKDF2_ITERATIONS': options['iterations']},
+        }
+        if importlib.util.find_spec('argon2'):
+            profiles['argon2'] = {'PASSWORD_HASHERS': [ARGON2]}
+        else:
+            self.stdout.write('argon2-cffi is not installed; skipping the argon2 profile')
+
+        with scratch_database():
+            users = UserProfile.objects.bulk_create([UserProfile(username=f'login-user-{number}')
+                                                     for number in range(options['users'])])
+            for name, overrides in profiles.items():
+                with override_settings(**overrides):
+                    password = make_password(PASSWORD)
+                    UserProfile.objects.filter(pk__in=[user.pk for user in users]).update(password=password)
+                    rate, cpu_rate = self.run(users, options['logins'], PASSWORD)
+                self.stdout.write(f'{name:24} {rate:>8,.1f} logins/s       {cpu_rate:>8,.1f} per CPU second')
+
+            # The first bad attempt per user pays for a hash; repeats within LOGIN_FAILURE_CACHE_SECONDS do not
+            cache.clear()
+            self.run(users, len(users), 'wrong password', expected=401)
+            rate, cpu_rate = self.run(users, options['logins'], 'wrong password', expected=401)
+            self.stdout.write(f'{"repeated bad credentials":24} {rate:>8,.1f} rejections/s   '
+                              f'{cpu_rate:>8,.1f} per CPU second')
+
+    def run(self, users, count, password, expected=200):
+        """Log in `count` times round-robin over `users` from one thread, that is on one core."""
+        client = APIClient()
+        url = reverse('login')
+        started, cpu_started = time.perf_counter(), time.process_time()
+        for number in range(count):
+            response = client.post(url, {'username': users[number % len(users)].username, 'password': password},
+                                   format='json')
+            if response.status_code != expected:
+                raise CommandError(f'Login answered {response.status_code}, expected {expected}')
+        return count / (time.perf_counter() - started), count / (time.process_time() - cpu_started)
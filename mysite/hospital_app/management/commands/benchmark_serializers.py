@@ -0,0 +1,51 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from hospital_app.fastpath import FastListSerializer
+from hospital_app.models import Appointment, DoctorProfile, Feedback, MedicalRecord, Message, PatientProfile
+from hospital_app.serializers import (AppointmentSerializer, DoctorProfileListSerializer, FeedbackSerializer,
+                                      MedicalRecordSerializer, MessageSerializer, PatientProfileListSerializer)
+
+ENDPOINTS = {
+    'doctors': (DoctorProfile.objects.for_catalog(), DoctorProfileListSerializer),
+    'patients': (PatientProfile.objects.select_related('user'), PatientProfileListSerializer),
+    'appointments': (Appointment.objects.select_related('patient__user', 'doctor'), AppointmentSerializer),
+    'medical_records': (MedicalRecord.objects.select_related('patient__user', 'doctor'), MedicalRecordSerializer),
+    'feedbacks': (Feedback.objects.select_related('patient__user', 'doctor'), FeedbackSerializer),
+    'messages': (Message.objects.select_related('author__user'), MessageSerializer),
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare rows per second of the DRF and the compiled list serializers on existing rows (read only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoints', nargs='*', help=f'Any of {", ".join(ENDPOINTS)}; all by default')
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        context = {'request': Request(APIRequestFactory().get('/'))}
+        renderer = JSONRenderer()
+        unknown = set(options['endpoints']) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+        for name in options['endpoints'] or ENDPOINTS:
+            queryset, serializer_class = ENDPOINTS[name]
+            rows = list(queryset.order_by('pk')[:options['rows']])
+            if not rows:
+                self.stdout.write(f'{name:16} no rows')
+                continue
+            results = {}
+            for path, build in (
+                    ('drf', lambda: serializer_class(rows, many=True, context=context)),
+                    ('fast', lambda: FastListSerializer(rows, child=serializer_class(context=context), context=context))):
+                start = time.perf_counter()
+                for _ in range(options['repeat']):
+                    data = build().data
+                results[path] = (len(rows) * options['repeat'] / (time.perf_counter() - start), renderer.render(data))
+            same = 'identical' if results['drf'][1] == results['fast'][1] else 'DIFFERENT OUTPUT'
+            self.stdout.write(f'{name:16} drf {results["drf"][0]:>10,.0f} rows/s   fast {results["fast"][0]:>10,.0f} rows/s'
+                              f'   x{results["fast"][0] / results["drf"][0]:.1f}   {same}')
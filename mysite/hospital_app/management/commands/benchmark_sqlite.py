@@ -0,0 +1,100 @@
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from hospital_app.write_queue import WriteQueue
+
+PROFILES = ('default', 'production')
+
+
+class Command(BaseCommand):
+    help = ('Stress a scratch SQLite database with mixed reads and booking-style writes from many threads, '
+            'with the default and the production SQLite profile')
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', nargs='*', help=f'Any of {", ".join(PROFILES)}; both by default')
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--operations', type=int, default=200, help='Operations per thread')
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+        parser.add_argument('--rows', type=int, default=10000, help='Rows in the table before the run')
+
+    def handle(self, *args, **options):
+        profiles = [profile for profile in PROFILES if profile in options['profiles']] or PROFILES
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in profiles:
+                self.report(profile, self.run(profile, Path(directory) / f'{profile}.sqlite3', options))
+
+    def run(self, profile, path, options):
+        alias = f'benchmark_{profile}'
+        database = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(path),
+                    'OPTIONS': dict(settings.SQLITE_PRODUCTION_OPTIONS) if profile == 'production' else {}}
+        connections.settings[alias] = connections.configure_settings(
+            {'default': dict(settings.DATABASES['default']), alias: database})[alias]
+        queue = WriteQueue(timeout=settings.SQLITE_BUSY_TIMEOUT, enabled=profile == 'production')
+        slots = max(options['rows'], 1)
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('CREATE TABLE booking (id INTEGER PRIMARY KEY, doctor INTEGER, slot INTEGER, '
+                               'note TEXT)')
+                cursor.execute('CREATE INDEX booking_doctor_slot ON booking (doctor, slot)')
+                cursor.executemany('INSERT INTO booking (doctor, slot, note) VALUES (%s, %s, %s)',
+                                   [(number % 100, number, 'seed') for number in range(options['rows'])])
+            connections[alias].close()
+
+            def work(number):
+                rng = random.Random(number)
+                reads, writes, failed = [], [], 0
+                try:
+                    for _ in range(options['operations']):
+                        doctor, slot = rng.randrange(100), rng.randrange(slots * 2)
+                        started = time.perf_counter()
+                        if rng.random() >= options['write_ratio']:
+                            with connections[alias].cursor() as cursor:
+                                cursor.execute('SELECT count(*), max(slot) FROM booking WHERE doctor = %s',
+                                               [doctor])
+                                cursor.fetchone()
+                            reads.append(time.perf_counter() - started)
+                            continue
+                        try:
+                            with queue.slot(), transaction.atomic(using=alias):
+                                with connections[alias].cursor() as cursor:
+                                    cursor.execute('SELECT 1 FROM booking WHERE doctor = %s AND slot = %s',
+                                                   [doctor, slot])
+                                    if cursor.fetchone() is None:
+                                        cursor.execute('INSERT INTO booking (doctor, slot, note) '
+                                                       'VALUES (%s, %s, %s)', [doctor, slot, 'booked'])
+                            writes.append(time.perf_counter() - started)
+                        except OperationalError:
+                            failed += 1
+                finally:
+                    connections[alias].close()
+                return reads, writes, failed
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options['threads']) as executor:
+                results = list(executor.map(work, range(options['threads'])))
+            elapsed = time.perf_counter() - started
+        finally:
+            connections.settings.pop(alias, None)
+
+        reads = [latency for result in results for latency in result[0]]
+        writes = [latency for result in results for latency in result[1]]
+        return elapsed, reads, writes, sum(result[2] for result in results)
+
+    def report(self, profile, result):
+        elapsed, reads, writes, failed = result
+        done = len(reads) + len(writes)
+
+        def p99(latencies):
+            if len(latencies) < 2:
+                return sum(latencies) * 1000
+            return statistics.quantiles(latencies, n=100)[98] * 1000
+
+        self.stdout.write(f'{profile:11} {done / elapsed:>9,.0f} ops/s   reads {len(reads) / elapsed:>9,.0f}/s '
+                          f'p99 {p99(reads):>7.1f} ms   writes {len(writes) / elapsed:>7,.0f}/s '
+                          f'p99 {p99(writes):>7.1f} ms   failed writes {failed}')
@@ -0,0 +1,66 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import django
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from hospital_app.images import needs_variants, render_variants, store_variants, variants_field
+from hospital_app.models import Message, UserProfile
+
+IMAGE_FIELDS = ((UserProfile, 'profile_picture'), (Message, 'image'))
+
+
+def render(name):
+    try:
+        return render_variants(name), None
+    except Exception as exc:
+        return None, repr(exc)
+
+
+class Command(BaseCommand):
+    help = 'Build the resized WebP/JPEG variants of existing profile pictures and chat images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild variants that already exist')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Rendering processes; IMAGE_VARIANT_WORKERS by default, 0 renders inline')
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        workers = settings.IMAGE_VARIANT_WORKERS if options['workers'] is None else options['workers']
+        pool = None
+        if workers:
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=django.setup)
+        try:
+            for model, field_name in IMAGE_FIELDS:
+                self.build(model, field_name, pool, options)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def build(self, model, field_name, pool, options):
+        rows = model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}).only(
+            'pk', field_name, variants_field(field_name)).order_by('pk').iterator(chunk_size=options['batch_size'])
+        built = skipped = failed = original_bytes = card_bytes = 0
+        label = model._meta.label
+        while batch := list(islice(rows, options['batch_size'])):
+            todo = [(row.pk, getattr(row, field_name).name) for row in batch
+                    if needs_variants(row, field_name, options['force'])]
+            skipped += len(batch) - len(todo)
+            names = [name for _, name in todo]
+            results = pool.map(render, names) if pool is not None else map(render, names)
+            for (pk, name), (variants, error) in zip(todo, results):
+                if error is not None:
+                    failed += 1
+                    self.stderr.write(f'{label} {pk}: {name}: {error}')
+                    continue
+                store_variants(label, pk, field_name, name, variants)
+                built += 1
+                original_bytes += default_storage.size(name)
+                card = variants['sizes'].get('card', {})
+                card_bytes += default_storage.size(card['webp']) if 'webp' in card else 0
+        self.stdout.write(f'{label}.{field_name}: {built} built, {skipped} up to date, {failed} failed')
+        if built:
+            self.stdout.write(f'  originals {original_bytes / 1024:,.0f} KB -> card.webp {card_bytes / 1024:,.0f} KB')
@@ -0,0 +1,102 @@
+import asyncio
+import datetime
+import time
+import uuid
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from hospital_app.chat_store import message_buffer
+from hospital_app.frames import MSGPACK_SUBPROTOCOL, decode, encode_binary, encode_text
+from hospital_app.models import Chat, DoctorProfile, Message, PatientProfile, UserProfile
+from hospital_app.routing import websocket_urlpatterns
+
+IN_MEMORY_LAYER = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'CONFIG': {'capacity': 100000},
+    },
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure chat throughput of one worker, offline, with the in-memory channel layer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=10)
+        parser.add_argument('--clients', type=int, default=10, help='Clients per room')
+        parser.add_argument('--messages', type=int, default=50, help='Messages sent by each client')
+        parser.add_argument('--binary', action='store_true', help='Use the msgpack subprotocol')
+        parser.add_argument('--persist', action='store_true',
+                            help='Talk as a patient so that messages are stored; the temporary chats are deleted afterwards')
+
+    def handle(self, *args, **options):
+        # Only chat members may connect: --persist talks as a patient, whose messages are stored, and
+        # otherwise as a doctor, whose messages are only fanned out.
+        name = f'loadtest-{uuid.uuid4().hex[:12]}'
+        if options['persist']:
+            user = UserProfile.objects.create_user(username=name)
+            member = PatientProfile.objects.create(user=user, emergency_contact='+10000000000', blood_type='-')
+        else:
+            user = member = DoctorProfile.objects.create_user(username=name, shift_start=datetime.time(0),
+                                                              shift_end=datetime.time(0), price=0)
+        chats = [Chat.objects.create() for _ in range(options['rooms'])]
+        for chat in chats:
+            (chat.patient if options['persist'] else chat.person).add(member)
+
+        try:
+            with override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER):
+                channel_layers.backends.clear()
+                elapsed, delivered = asyncio.run(self.run(options, user, chats))
+            channel_layers.backends.clear()
+
+            sent = options['rooms'] * options['clients'] * options['messages']
+            self.stdout.write(f'sent:      {sent} messages in {elapsed:.3f}s ({sent / elapsed:,.0f} msg/s)')
+            self.stdout.write(f'delivered: {delivered} frames ({delivered / elapsed:,.0f} frames/s)')
+            if options['persist']:
+                stored = Message.objects.filter(chat__in=chats).count()
+                self.stdout.write(f'stored:    {stored} messages ({stored / elapsed:,.0f} msg/s)')
+        finally:
+            Chat.objects.filter(pk__in=[chat.pk for chat in chats]).delete()
+            UserProfile.objects.filter(pk=user.pk).delete()
+
+    async def run(self, options, user, chats):
+        application = URLRouter(websocket_urlpatterns)
+        subprotocols = [MSGPACK_SUBPROTOCOL] if options['binary'] else None
+        encode = encode_binary if options['binary'] else encode_text
+        rooms = [str(chat.pk) for chat in chats]
+        expected = options['clients'] * options['messages']
+
+        clients = []
+        for room in rooms:
+            for _ in range(options['clients']):
+                communicator = WebsocketCommunicator(application, f'/ws/chat/{room}/', subprotocols=subprotocols)
+                communicator.scope['user'] = user
+                await communicator.connect()
+                clients.append(communicator)
+
+        async def talk(communicator):
+            for number in range(options['messages']):
+                payload = encode({'message': f'message {number}'})
+                if options['binary']:
+                    await communicator.send_to(bytes_data=payload)
+                else:
+                    await communicator.send_to(text_data=payload)
+
+        async def listen(communicator):
+            for _ in range(expected):
+                frame = await communicator.receive_output(timeout=30)
+                decode(frame.get('text'), frame.get('bytes'))
+            return expected
+
+        started = time.perf_counter()
+        listeners = [asyncio.ensure_future(listen(communicator)) for communicator in clients]
+        await asyncio.gather(*[talk(communicator) for communicator in clients])
+        delivered = sum(await asyncio.gather(*listeners))
+        await message_buffer.flush()
+        elapsed = time.perf_counter() - started
+
+        for communicator in clients:
+            await communicator.disconnect()
+        return elapsed, delivered
@@ -0,0 +1,23 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from hospital_app.imports import IMPORT_FORMATS, detect_format, import_doctors
+
+
+class Command(BaseCommand):
+    help = 'Import doctors with their departments and specialties from a CSV, JSON or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--file-format', choices=IMPORT_FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or detect_format(options['path'])
+        if file_format not in IMPORT_FORMATS:
+            raise CommandError(f'Unknown format "{file_format}", use --file-format')
+        with open(options['path'], 'rb') as binary_file:
+            result = import_doctors(binary_file, file_format, options['chunk_size'])
+        for error in result['errors']:
+            self.stderr.write(f'Row {error["row"]}: {json.dumps(error["errors"], ensure_ascii=False)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result["created"]} doctors, skipped {len(result["errors"])} rows'))
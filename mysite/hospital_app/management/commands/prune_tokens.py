@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from hospital_app.tokens import blacklist_cache
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding (and blacklisted) tokens in small batches; run it periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            ids = list(OutstandingToken.objects.filter(expires_at__lte=now)
+                       .order_by('id').values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+        blacklist_cache.prune()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired tokens'))
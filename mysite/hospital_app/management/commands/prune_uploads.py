@@ -0,0 +1,26 @@
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from hospital_app.models import ChatUpload
+from hospital_app.uploads import discard
+
+
+class Command(BaseCommand):
+    help = 'Delete chat uploads (and their part files) started more than CHAT_UPLOAD_EXPIRE_HOURS ago; run it periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(hours=settings.CHAT_UPLOAD_EXPIRE_HOURS)
+        deleted = 0
+        while True:
+            uploads = list(ChatUpload.objects.filter(created_at__lte=cutoff).order_by('created_at')
+                           [:options['batch_size']])
+            if not uploads:
+                break
+            for upload in uploads:
+                discard(upload)
+            deleted += len(uploads)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired uploads'))
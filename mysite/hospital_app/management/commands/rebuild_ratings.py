@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from hospital_app.models import DoctorProfile
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored rating aggregates of every doctor from Feedback rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('doctor_ids', nargs='*', type=int, help='Only rebuild these doctors')
+
+    def handle(self, *args, **options):
+        updated = DoctorProfile.refresh_ratings(options['doctor_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt ratings for {updated} doctors'))
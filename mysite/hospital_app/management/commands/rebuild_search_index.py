@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from hospital_app.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Recreate the doctor full-text search index from scratch'
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} doctors'))
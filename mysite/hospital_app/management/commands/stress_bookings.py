@@ -0,0 +1,75 @@
+import datetime
+import threading
+import time
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.urls import reverse
+from rest_framework.test import APIClient
+from hospital_app.management.scratch import scratch_database
+from hospital_app.models import Appointment, DoctorProfile, PatientProfile, UserProfile
+
+
+class Command(BaseCommand):
+    help = ('Seed a scratch database and let many clients book the same doctor and time at once; each slot must '
+            'end with exactly one active appointment and every other client must get a clean refusal')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=20, help='Parallel bookings per slot')
+        parser.add_argument('--slots', type=int, default=50, help='Contested slots, booked one after another')
+
+    def handle(self, *args, **options):
+        clients, slots = options['clients'], options['slots']
+        with scratch_database():
+            staff = UserProfile.objects.create_user(username='stress-staff', is_staff=True)
+            doctor = DoctorProfile.objects.create_user(
+                username='stress-doctor', shift_start=datetime.time(0), shift_end=datetime.time(23, 59),
+                working_days=['Monday'], price=100)
+            patients = [PatientProfile.objects.create(
+                user=UserProfile.objects.create_user(username=f'stress-patient-{number}'),
+                emergency_contact='+10000000000', blood_type='A') for number in range(clients)]
+            start = datetime.datetime(2030, 1, 7, tzinfo=datetime.timezone.utc)
+
+            statuses, elapsed = Counter(), 0.0
+            for slot in range(slots):
+                date_time = (start + datetime.timedelta(minutes=30 * slot)).isoformat()
+                requests = [{'patient': patient.pk, 'doctor': doctor.pk, 'date_time': date_time, 'status': 'planned'}
+                            for patient in patients]
+                answers, seconds = self.race(staff, requests)
+                statuses.update(answers)
+                elapsed += seconds
+                if answers.count(201) != 1:
+                    raise CommandError(f'Slot {date_time}: {answers.count(201)} bookings accepted, answers {answers}')
+
+            active = Appointment.objects.exclude(status='cancelled').values('date_time').distinct().count()
+            booked = Appointment.objects.count()
+            self.stdout.write(f'{slots} slots x {clients} clients: answers {dict(sorted(statuses.items()))}')
+            self.stdout.write(f'{booked} appointments stored for {active} slots, '
+                              f'{slots * clients / elapsed:,.0f} booking requests/s')
+            if booked != slots or active != slots:
+                raise CommandError(f'Expected one appointment per slot, found {booked} for {active} slots')
+            if set(statuses) - {201, 400, 409}:
+                raise CommandError('Some bookings failed with an unexpected status')
+
+    def race(self, user, requests):
+        """POST all `requests` to appointment_create at the same moment, one thread each; return the statuses."""
+        url = reverse('appointment_create')
+        barrier = threading.Barrier(len(requests))
+        answers = [None] * len(requests)
+
+        def book(index):
+            client = APIClient()
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                answers[index] = client.post(url, requests[index], format='json').status_code
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=book, args=(index,)) for index in range(len(requests))]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return answers, time.perf_counter() - started
@@ -0,0 +1,30 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def scratch_database():
+    """
+    Run the block against a freshly migrated test database, for benchmarks
+    that seed synthetic rows, and drop it afterwards. On SQLite it is a
+    file in a temporary directory, so threads share it like a real
+    database; replicas mirror it. The configured database is not touched.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'scratch.sqlite3')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+        try:
+            yield connection
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:55
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_ratings(apps, schema_editor):
+    DoctorProfile = apps.get_model('hospital_app', 'DoctorProfile')
+    Feedback = apps.get_model('hospital_app', 'Feedback')
+    totals = Feedback.objects.values('doctor_id').order_by().annotate(
+        total=Sum('rating'), rated=Count('rating'), comments=Count('id'))
+    for row in totals:
+        DoctorProfile.objects.filter(pk=row['doctor_id']).update(
+            rating_sum=row['total'] or 0,
+            rating_count=row['rated'],
+            avg_rating=round(row['total'] / row['rated'], 1) if row['rated'] else None,
+            comment_count=row['comments'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0005_chat_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='avg_rating',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:56
+
+import hospital_app.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0006_doctorprofile_avg_rating_doctorprofile_comment_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='doctorprofile',
+            managers=[
+                ('objects', hospital_app.models.DoctorProfileManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:59
+
+import logging
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+# Among active appointments booked for the same doctor and time, the one kept is a completed one, else the oldest
+KEEP_ORDER = {'completed': 0, 'planned': 1}
+
+
+def cancel_double_bookings(apps, schema_editor):
+    """Cancel the extra active appointments of each doubly booked slot, which the constraint would reject."""
+    Appointment = apps.get_model('hospital_app', 'Appointment')
+    db_alias = schema_editor.connection.alias
+    active = Appointment.objects.using(db_alias).exclude(status='cancelled')
+    slots = active.values('doctor_id', 'date_time').annotate(booked=models.Count('id')).filter(booked__gt=1)
+    cancelled = []
+    for slot in slots:
+        rows = active.filter(doctor_id=slot['doctor_id'], date_time=slot['date_time']).values_list('id', 'status')
+        rows = sorted(rows, key=lambda row: (KEEP_ORDER.get(row[1], 2), row[0]))
+        cancelled.extend(pk for pk, _ in rows[1:])
+        logger.warning('Doctor %s was booked %d times at %s; keeping appointment %s, cancelling %s',
+                       slot['doctor_id'], slot['booked'], slot['date_time'], rows[0][0],
+                       ', '.join(str(pk) for pk, _ in rows[1:]))
+    if cancelled:
+        Appointment.objects.using(db_alias).filter(pk__in=cancelled).update(status='cancelled')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0007_alter_doctorprofile_managers'),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_double_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'cancelled'), _negated=True), fields=('doctor', 'date_time'), name='unique_active_appointment'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+from django.db import migrations
+
+# The DDL and document layout of hospital_app.search as of this migration, inlined so later changes
+# to that module cannot change what this migration does.
+SEARCH_TABLE = 'hospital_app_doctor_search'
+LANGUAGES = ('en', 'ru')
+
+CREATE = {
+    'sqlite': [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        f"names, specialties, departments, bio, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    ],
+    'postgresql': [
+        f'CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ('
+        f'doctor_id bigint PRIMARY KEY REFERENCES hospital_app_doctorprofile (userprofile_ptr_id) '
+        f'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, document tsvector NOT NULL)',
+        f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_gin ON {SEARCH_TABLE} USING GIN (document)',
+    ],
+}
+INSERT = {
+    'sqlite': f'INSERT INTO {SEARCH_TABLE} (rowid, names, specialties, departments, bio) VALUES (%s, %s, %s, %s, %s)',
+    'postgresql': f"INSERT INTO {SEARCH_TABLE} (doctor_id, document) VALUES (%s, "
+                  f"setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') || "
+                  f"setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'C'))",
+}
+
+
+def localized(field):
+    return [field] + [f'{field}_{language}' for language in LANGUAGES]
+
+
+def join_unique(values):
+    return ' '.join(dict.fromkeys(value for value in values if value))
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in CREATE:
+        return
+    DoctorProfile = apps.get_model('hospital_app', 'DoctorProfile')
+    Specialty = apps.get_model('hospital_app', 'Specialty')
+    Department = apps.get_model('hospital_app', 'Department')
+
+    specialty_names, department_names = {}, {}
+    for doctor_id, *names in Specialty.doctor.through.objects.values_list(
+            'doctorprofile_id', *[f'specialty__{field}' for field in localized('specialty_name')]):
+        specialty_names.setdefault(doctor_id, []).extend(names)
+    for doctor_id, *names in Department.objects.values_list('doctor_id', *localized('department_name')):
+        department_names.setdefault(doctor_id, []).extend(names)
+    rows = [
+        (pk, join_unique([first_name, last_name]), join_unique(specialty_names.get(pk, [])),
+         join_unique(department_names.get(pk, [])), bio or '')
+        for pk, first_name, last_name, bio in DoctorProfile.objects.values_list(
+            'pk', 'first_name', 'last_name', 'doctor_information').iterator(chunk_size=2000)
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+        for statement in CREATE[vendor]:
+            cursor.execute(statement)
+        for start in range(0, len(rows), 2000):
+            cursor.executemany(INSERT[vendor], rows[start:start + 2000])
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0009_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
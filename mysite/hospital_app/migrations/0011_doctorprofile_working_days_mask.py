@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+
+def fill_masks(apps, schema_editor):
+    DoctorProfile = apps.get_model('hospital_app', 'DoctorProfile')
+    doctors = list(DoctorProfile.objects.only('pk', 'working_days'))
+    for doctor in doctors:
+        doctor.working_days_mask = sum(1 << DAYS.index(day) for day in set(doctor.working_days) if day in DAYS)
+    DoctorProfile.objects.bulk_update(doctors, ['working_days_mask'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0010_doctor_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='working_days_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_masks, migrations.RunPython.noop),
+    ]
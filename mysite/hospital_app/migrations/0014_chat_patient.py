@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0013_chat_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='patient',
+            field=models.ManyToManyField(blank=True, to='hospital_app.patientprofile'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0014_chat_patient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='doctor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='hospital_app.doctorprofile'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='author',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='hospital_app.patientprofile'),
+        ),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('author__isnull', False), ('doctor__isnull', True)), models.Q(('author__isnull', True), ('doctor__isnull', False)), _connector='OR'), name='message_one_author'),
+        ),
+    ]
@@ -1,11 +1,16 @@
-from django.db import models
-from django.contrib.auth.models import AbstractUser
-from django.core.validators import MinValueValidator, MaxValueValidator
+import uuid
+from django.db import models, transaction
+from django.db.models import Count, Q, Sum
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.core.validators import FileExtensionValidator, MinValueValidator, MaxValueValidator
 from phonenumber_field.modelfields import PhoneNumberField
 from multiselectfield import MultiSelectField
 from rest_framework.exceptions import ValidationError
 
 
+VIDEO_EXTENSIONS = ['mp4', 'webm', 'mov', 'm4v']
+IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp']
+
 ROLE_CHOICES = (
     ('doctor', 'doctor'),
     ('patient', 'patient')
@@ -15,11 +20,38 @@ class UserProfile(AbstractUser):
     age = models.PositiveSmallIntegerField(null=True, blank=True, validators=[MaxValueValidator(100)])
     phone_number = PhoneNumberField(null=True, blank=True)
     profile_picture = models.ImageField(upload_to='profile_image', null=True, blank=True)
+    profile_picture_variants = models.JSONField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f'{self.first_name}, {self.last_name}'
 
 
+class DoctorProfileQuerySet(models.QuerySet):
+    def for_catalog(self):
+        # A stable default order for page-number pagination; search ranking and ?ordering= replace it
+        return self.prefetch_related('specialty', 'department').order_by('price', 'pk')
+
+    def bulk_create_doctors(self, doctors, batch_size=500):
+        """bulk_create() for the multi-table DoctorProfile: UserProfile rows first, then the child rows."""
+        parent_fields = UserProfile._meta.concrete_fields
+        with transaction.atomic(using=self.db):
+            parents = UserProfile.objects.using(self.db).bulk_create(
+                [UserProfile(**{field.attname: getattr(doctor, field.attname) for field in parent_fields})
+                 for doctor in doctors], batch_size=batch_size)
+            for doctor, parent in zip(doctors, parents):
+                doctor.id = doctor.userprofile_ptr_id = parent.pk
+                doctor.working_days_mask = self.model.days_to_mask(doctor.working_days)
+                doctor._state.adding, doctor._state.db = False, self.db
+            for start in range(0, len(doctors), batch_size):
+                self._insert(doctors[start:start + batch_size], fields=self.model._meta.local_concrete_fields,
+                             using=self.db)
+        return doctors
+
+
+class DoctorProfileManager(UserManager.from_queryset(DoctorProfileQuerySet)):
+    pass
+
+
 class DoctorProfile(UserProfile):
     shift_start = models.TimeField()
     shift_end = models.TimeField()
@@ -31,28 +63,81 @@ class DoctorProfile(UserProfile):
         ('Friday', 'Friday'),
         ('Saturday', 'Saturday')
     )
+    DAY_BITS = {day: 1 << number for number, (day, _) in enumerate(DAY_CHOICES)}
     working_days = MultiSelectField(choices=DAY_CHOICES, max_length=64, max_choices=5)
+    working_days_mask = models.PositiveSmallIntegerField(default=0, editable=False)
     role = models.CharField(choices=ROLE_CHOICES, max_length=16, default='doctor')
     price = models.PositiveSmallIntegerField()
     experience = models.PositiveSmallIntegerField(null=True, blank=True)
     gender = models.BooleanField(default=False)
     doctor_information = models.TextField(null=True, blank=True)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    avg_rating = models.FloatField(null=True, blank=True, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = DoctorProfileManager()
 
     def __str__(self):
         return f'{self.first_name}, {self.last_name}, {self.role}'
 
     class Meta:
         verbose_name_plural = 'DoctorProfile'
+        indexes = [
+            models.Index(fields=['price', 'userprofile_ptr'], name='doctor_price_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.working_days_mask = self.days_to_mask(self.working_days)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'working_days' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'working_days_mask'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def days_to_mask(cls, days):
+        return sum(cls.DAY_BITS.get(day, 0) for day in set(days or []))
 
     def get_avg_rating(self):
-        rating = self.ratings.all()
-        if rating.exists():
-            return round(sum([i.rating for i in rating]) / rating.count(), 1)
+        return self.avg_rating
 
     def get_comment_count(self):
-        comment = self.ratings.all()
-        if comment.exists():
-            return comment.count()
+        return self.comment_count or None
+
+    @staticmethod
+    def rating_fields(rating_sum, rating_count, comment_count):
+        return {
+            'rating_sum': rating_sum or 0,
+            'rating_count': rating_count,
+            'avg_rating': round(rating_sum / rating_count, 1) if rating_count else None,
+            'comment_count': comment_count,
+        }
+
+    @classmethod
+    def refresh_ratings(cls, doctor_ids=None):
+        feedbacks = Feedback.objects.all()
+        doctors = cls.objects.all()
+        if doctor_ids is not None:
+            doctor_ids = {i for i in doctor_ids if i is not None}
+            if not doctor_ids:
+                return 0
+            feedbacks = feedbacks.filter(doctor_id__in=doctor_ids)
+            doctors = doctors.filter(pk__in=doctor_ids)
+
+        with transaction.atomic():
+            locked = list(doctors.select_for_update().values_list('pk', flat=True))
+            totals = {
+                row['doctor_id']: row for row in feedbacks.values('doctor_id').order_by().annotate(
+                    total=Sum('rating'), rated=Count('rating'), comments=Count('id'))
+            }
+            updated = []
+            for pk in locked:
+                row = totals.get(pk, {})
+                updated.append(cls(pk=pk, **cls.rating_fields(
+                    row.get('total'), row.get('rated', 0), row.get('comments', 0))))
+            cls.objects.bulk_update(updated, ['rating_sum', 'rating_count', 'avg_rating', 'comment_count'],
+                                    batch_size=500)
+        return len(updated)
 
 
 class Department(models.Model):
@@ -95,6 +180,16 @@ class Appointment(models.Model):
     def __str__(self):
         return f'{self.patient}, {self.doctor}'
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'date_time'], condition=~models.Q(status='cancelled'),
+                                    name='unique_active_appointment'),
+        ]
+        indexes = [
+            models.Index(fields=['doctor', 'date_time'], name='appointment_doctor_date_idx'),
+            models.Index(fields=['patient', 'status'], name='appointment_patient_status_idx'),
+        ]
+
 
 class MedicalRecord(models.Model):
     patient = models.ForeignKey(PatientProfile, on_delete=models.CASCADE)
@@ -107,6 +202,11 @@ class MedicalRecord(models.Model):
     def __str__(self):
         return f'{self.patient}, {self.doctor}'
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'created_at'], name='record_patient_created_idx'),
+        ]
+
 
 class Feedback(models.Model):
     patient = models.ForeignKey(PatientProfile, on_delete=models.CASCADE)
@@ -118,23 +218,66 @@ class Feedback(models.Model):
     def __str__(self):
         return f'{self.patient}, {self.doctor}'
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'created_at'], name='feedback_doctor_created_idx'),
+        ]
+
     def clean(self):
         super().clean()
         if not self.rating and not self.comment:
             raise ValidationError('Choose minimum one of (rating, comment)!')
 
 
+class ChatQuerySet(models.QuerySet):
+    def of_member(self, user):
+        """Chats `user` takes part in, as one of its doctors or patients."""
+        if user is None or not user.is_authenticated:
+            return self.none()
+        return self.filter(Q(person__pk=user.pk) | Q(patient__user=user))
+
+
 class Chat(models.Model):
     person = models.ManyToManyField(DoctorProfile)
+    patient = models.ManyToManyField(PatientProfile, blank=True)
     created_at = models.DateField(auto_now_add=True)
 
+    objects = ChatQuerySet.as_manager()
+
 
 class Message(models.Model):
     chat = models.ForeignKey(Chat, on_delete=models.CASCADE)
-    author = models.ForeignKey(PatientProfile, on_delete=models.CASCADE)
+    author = models.ForeignKey(PatientProfile, on_delete=models.CASCADE, null=True, blank=True)
+    doctor = models.ForeignKey(DoctorProfile, on_delete=models.CASCADE, null=True, blank=True)
     text = models.TextField(null=True, blank=True)
     image = models.ImageField(upload_to='images', null=True, blank=True)
-    video = models.FileField(upload_to='videos', null=True, blank=True)
+    image_variants = models.JSONField(null=True, blank=True, editable=False)
+    video = models.FileField(upload_to='videos', null=True, blank=True,
+                             validators=[FileExtensionValidator(VIDEO_EXTENSIONS)])
     created_date = models.DateTimeField(auto_now_add=True)
 
-
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=models.Q(author__isnull=False, doctor__isnull=True)
+                                   | models.Q(author__isnull=True, doctor__isnull=False),
+                                   name='message_one_author'),
+        ]
+        indexes = [
+            models.Index(fields=['chat', 'created_date'], name='message_chat_created_idx'),
+        ]
+
+
+class ChatUpload(models.Model):
+    KIND_CHOICES = (
+        ('image', 'image'),
+        ('video', 'video')
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE)
+    author = models.ForeignKey(PatientProfile, on_delete=models.CASCADE)
+    kind = models.CharField(choices=KIND_CHOICES, max_length=16)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    message = models.OneToOneField(Message, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
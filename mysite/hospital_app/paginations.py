@@ -1,17 +1,281 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
-class DoctorProfilePagination(PageNumberPagination):
+
+def count_disabled(request):
+    return request.query_params.get('count', '').lower() in ('0', 'false', 'no')
+
+
+class CountlessPageNumberPagination(PageNumberPagination):
+    count_skipped = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_skipped = count_disabled(request)
+        if not self.count_skipped:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        try:
+            self.number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            self.number = 0
+        if self.number < 1:
+            raise NotFound(self.invalid_page_message)
+
+        self.request = request
+        offset = (self.number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if not self.count_skipped:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.number + 1)
+
+    def get_previous_link(self):
+        if not self.count_skipped:
+            return super().get_previous_link()
+        if self.number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.number - 1)
+
+    def get_paginated_response(self, data):
+        if not self.count_skipped:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class CountlessLimitOffsetPagination(LimitOffsetPagination):
+    count_skipped = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_skipped = count_disabled(request)
+        if not self.count_skipped:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def get_next_link(self):
+        if not self.count_skipped:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        if not self.count_skipped:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique composite ordering such as (price, id).
+
+    The cursor stores the ordering values of the last row, so every page is a
+    `WHERE (price, id) > (...)` range read instead of an OFFSET scan.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, request):
+        if request.query_params.get(api_settings.ORDERING_PARAM, '').startswith('-'):
+            return self.reverse_ordering(self.ordering)
+        return self.ordering
+
+    @staticmethod
+    def reverse_ordering(ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+    @staticmethod
+    def after(ordering, values):
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def decode_cursor(self, request, model):
+        """The cursor's ordering values as the fields' Python types, or a 404 for anything a client tampered with."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if (not isinstance(cursor, dict) or not isinstance(cursor.get('r'), bool)
+                    or not isinstance(cursor.get('v'), list) or len(cursor['v']) != len(self.ordering)):
+                raise ValueError
+            values = []
+            for field, value in zip(self.ordering, cursor['v']):
+                if value is None:
+                    raise ValueError
+                values.append(model._meta.get_field(field.lstrip('-')).to_python(value))
+            return {'v': values, 'r': cursor['r']}
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        values = []
+        for field in self.ordering:
+            value = getattr(row, field.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        encoded = base64.urlsafe_b64encode(json.dumps({'v': values, 'r': reverse}).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        ordering = self.get_ordering(request)
+        cursor = self.decode_cursor(request, queryset.model)
+        reverse = bool(cursor and cursor['r'])
+        if reverse:
+            ordering = self.reverse_ordering(ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if cursor:
+            queryset = queryset.filter(self.after(ordering, cursor['v']))
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = cursor is not None, has_more
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class SelectablePaginationMixin:
+    """Switch a list view to keyset pagination with `?pagination=cursor`."""
+    keyset_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            request = getattr(self, 'request', None)
+            if self.keyset_pagination_class and request is not None and (
+                    request.query_params.get('pagination') == 'cursor'
+                    or KeysetPagination.cursor_query_param in request.query_params):
+                self._paginator = self.keyset_pagination_class()
+        return super().paginator
+
+
+class DoctorProfilePagination(CountlessPageNumberPagination):
     page_size = 2
     page_size_query_param = 'page_size'
     max_page_size = 5
 
-class PatientProfilePagination(PageNumberPagination):
+
+class DoctorProfileKeysetPagination(KeysetPagination):
+    page_size = 2
+    max_page_size = 5
+    ordering = ('price', 'id')
+
+
+class AvailabilityPagination(CountlessPageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class PatientProfilePagination(CountlessPageNumberPagination):
+    page_size = 2
+
+
+class PatientProfileKeysetPagination(KeysetPagination):
     page_size = 2
+    ordering = ('id',)
 
 
-class SpecialtyPagination(PageNumberPagination):
+class SpecialtyPagination(CountlessPageNumberPagination):
     page_size = 5
 
 
-class DepartmentPagination(PageNumberPagination):
+class DepartmentPagination(CountlessPageNumberPagination):
     page_size = 5
+
+
+class AppointmentPagination(CountlessLimitOffsetPagination):
+    pass
+
+
+class AppointmentKeysetPagination(KeysetPagination):
+    ordering = ('date_time', 'id')
+
+
+class MedicalRecordPagination(CountlessLimitOffsetPagination):
+    pass
+
+
+class MedicalRecordKeysetPagination(KeysetPagination):
+    ordering = ('created_at', 'id')
+
+
+class MessageKeysetPagination(KeysetPagination):
+    page_size = 50
+    ordering = ('-created_date', '-id')
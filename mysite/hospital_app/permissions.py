@@ -1,4 +1,5 @@
 from rest_framework import permissions
+from .models import Chat, DoctorProfile
 
 class CheckDoctorProfile(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
@@ -9,3 +10,13 @@ class CheckPatientProfile(permissions.BasePermission):
         return request.user == obj.role == 'patient'
 
 
+class CheckChatMember(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return Chat.objects.of_member(request.user).filter(pk=view.kwargs['pk']).exists()
+
+
+class IsDoctorOrAdmin(permissions.BasePermission):
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and (
+            user.is_staff or DoctorProfile.objects.filter(pk=user.pk).exists()))
@@ -0,0 +1,175 @@
+import re
+from django.conf import settings
+from django.db import connection, connections, router
+from modeltranslation.settings import AVAILABLE_LANGUAGES
+from modeltranslation.utils import build_localized_fieldname
+
+SEARCH_TABLE = 'hospital_app_doctor_search'
+
+
+def localized(field):
+    return [field] + [build_localized_fieldname(field, language) for language in AVAILABLE_LANGUAGES]
+
+
+def join_unique(values):
+    return ' '.join(dict.fromkeys(value for value in values if value))
+
+
+def documents(doctor_ids=None, models=None):
+    """Return `{doctor_id: (names, specialties, departments, bio)}` built with three queries."""
+    if models is None:
+        from .models import Department, DoctorProfile, Specialty
+        models = DoctorProfile, Specialty, Department
+    doctor_model, specialty_model, department_model = models
+
+    doctors = doctor_model.objects.all()
+    links = specialty_model.doctor.through.objects.all()
+    departments = department_model.objects.all()
+    if doctor_ids is not None:
+        doctors = doctors.filter(pk__in=doctor_ids)
+        links = links.filter(doctorprofile_id__in=doctor_ids)
+        departments = departments.filter(doctor_id__in=doctor_ids)
+
+    specialty_names, department_names = {}, {}
+    for doctor_id, *names in links.values_list(
+            'doctorprofile_id', *[f'specialty__{field}' for field in localized('specialty_name')]):
+        specialty_names.setdefault(doctor_id, []).extend(names)
+    for doctor_id, *names in departments.values_list('doctor_id', *localized('department_name')):
+        department_names.setdefault(doctor_id, []).extend(names)
+
+    return {
+        pk: (join_unique([first_name, last_name]), join_unique(specialty_names.get(pk, [])),
+             join_unique(department_names.get(pk, [])), bio or '')
+        for pk, first_name, last_name, bio in doctors.values_list(
+            'pk', 'first_name', 'last_name', 'doctor_information').iterator(chunk_size=2000)
+    }
+
+
+def query_terms(query):
+    return re.findall(r'\w+', query.lower())[:8]
+
+
+class SQLiteBackend:
+    """FTS5 table whose rowid is the doctor id; ranked with bm25, names weighted highest."""
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            f"names, specialties, departments, bio, tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+
+    def drop(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def delete(self, cursor, doctor_ids):
+        cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(pk,) for pk in doctor_ids])
+
+    def upsert(self, cursor, docs):
+        self.delete(cursor, list(docs))
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, names, specialties, departments, bio) VALUES (%s, %s, %s, %s, %s)',
+            [(pk, *doc) for pk, doc in docs.items()])
+
+    def search(self, cursor, terms, limit, within=None):
+        within_sql, within_params = (f'AND rowid IN ({within[0]}) ', within[1]) if within else ('', ())
+        cursor.execute(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s {within_sql}'
+            f'ORDER BY bm25({SEARCH_TABLE}, 10.0, 5.0, 5.0, 1.0) LIMIT %s',
+            [' '.join(f'"{term}"*' for term in terms), *within_params, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresBackend:
+    """Weighted tsvector per doctor with a GIN index, using the language-neutral 'simple' config."""
+
+    document = ("setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'C')")
+
+    def create(self, cursor):
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ('
+            f'doctor_id bigint PRIMARY KEY REFERENCES hospital_app_doctorprofile (userprofile_ptr_id) '
+            f'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, document tsvector NOT NULL)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_gin ON {SEARCH_TABLE} USING GIN (document)')
+
+    def drop(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def delete(self, cursor, doctor_ids):
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE doctor_id = ANY(%s)', [list(doctor_ids)])
+
+    def upsert(self, cursor, docs):
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (doctor_id, document) VALUES (%s, {self.document}) '
+            f'ON CONFLICT (doctor_id) DO UPDATE SET document = EXCLUDED.document',
+            [(pk, *doc) for pk, doc in docs.items()])
+
+    def search(self, cursor, terms, limit, within=None):
+        query = ' & '.join(f'{term}:*' for term in terms)
+        within_sql, within_params = (f'AND doctor_id IN ({within[0]}) ', within[1]) if within else ('', ())
+        cursor.execute(
+            f"SELECT doctor_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('simple', %s) {within_sql}"
+            f"ORDER BY ts_rank(document, to_tsquery('simple', %s)) DESC LIMIT %s",
+            [query, *within_params, query, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {'sqlite': SQLiteBackend(), 'postgresql': PostgresBackend()}
+
+
+def get_backend(db_connection=None):
+    return BACKENDS.get((db_connection or connection).vendor)
+
+
+def index_doctors(doctor_ids):
+    backend = get_backend()
+    doctor_ids = {pk for pk in doctor_ids if pk is not None}
+    if backend is None or not doctor_ids:
+        return
+    docs = documents(doctor_ids)
+    with connection.cursor() as cursor:
+        backend.delete(cursor, doctor_ids - set(docs))
+        if docs:
+            backend.upsert(cursor, docs)
+
+
+def remove_doctors(doctor_ids):
+    backend = get_backend()
+    if backend is not None:
+        with connection.cursor() as cursor:
+            backend.delete(cursor, doctor_ids)
+
+
+def rebuild_index(db_connection=None, models=None, chunk_size=2000):
+    db_connection = db_connection or connection
+    backend = get_backend(db_connection)
+    if backend is None:
+        return 0
+    docs = documents(models=models)
+    items = list(docs.items())
+    with db_connection.cursor() as cursor:
+        backend.drop(cursor)
+        backend.create(cursor)
+        for start in range(0, len(items), chunk_size):
+            backend.upsert(cursor, dict(items[start:start + chunk_size]))
+    return len(items)
+
+
+def search_doctors(query, queryset=None):
+    """
+    Ranked doctor ids matching `query`, or None when the database has no
+    full-text backend. With `queryset`, only its doctors are searched, so
+    SEARCH_RESULT_LIMIT caps the matches left after the other filters.
+    """
+    from .models import DoctorProfile
+    alias = router.db_for_read(DoctorProfile) if queryset is None else queryset.db
+    db_connection = connections[alias]
+    backend = get_backend(db_connection)
+    if backend is None:
+        return None
+    terms = query_terms(query)
+    if not terms:
+        return []
+    limit = getattr(settings, 'SEARCH_RESULT_LIMIT', 1000)
+    within = None if queryset is None else queryset.order_by().values('pk').query.sql_with_params()
+    with db_connection.cursor() as cursor:
+        return backend.search(cursor, terms, limit, within)
@@ -1,7 +1,15 @@
-from rest_framework import serializers
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
 from .models import *
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
+from .auth import authenticate_cached, token_response
+from .hashers import hash_passwords
+from .fieldsets import SparseFieldsMixin
+from .images import ImageVariantsField
+from .caching import invalidate
+from .search import index_doctors
+from django.conf import settings
+import datetime
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -15,15 +23,7 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
     def to_representation(self, instance):
-        refresh = RefreshToken.for_user(instance)
-        return {
-            'user': {
-                'username': instance.username,
-                'email': instance.email,
-            },
-            'access': str(refresh.access_token),
-            'refresh': str(refresh),
-        }
+        return token_response(instance)
 
 
 class LoginSerializer(serializers.Serializer):
@@ -31,27 +31,21 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
     def validate(self, data):
-        user = authenticate(**data)
-        if user and user.is_active:
+        user = authenticate_cached(data['username'], data['password'])
+        if user:
             return user
         raise serializers.ValidationError("Неверные учетные данные")
 
     def to_representation(self, instance):
-        refresh = RefreshToken.for_user(instance)
-        return {
-            'user': {
-                'username': instance.username,
-                'email': instance.email,
-            },
-            'access': str(refresh.access_token),
-            'refresh': str(refresh),
-        }
+        return token_response(instance)
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    profile_picture_variants = ImageVariantsField()
+
     class Meta:
         model = UserProfile
-        fields = '__all__'
+        exclude = ['password', 'groups', 'user_permissions']
 
 
 class UserProfileAppointmentSerializer(serializers.ModelSerializer):
@@ -61,9 +55,11 @@ class UserProfileAppointmentSerializer(serializers.ModelSerializer):
 
 
 class UserProfilePatientSerializer(serializers.ModelSerializer):
+    profile_picture_variants = ImageVariantsField()
+
     class Meta:
         model = UserProfile
-        fields = ['first_name', 'last_name', 'age', 'phone_number', 'profile_picture']
+        fields = ['first_name', 'last_name', 'age', 'phone_number', 'profile_picture', 'profile_picture_variants']
 
 
 class UserProfileAppointmentPatientSerializer(serializers.ModelSerializer):
@@ -72,7 +68,7 @@ class UserProfileAppointmentPatientSerializer(serializers.ModelSerializer):
         fields = ['first_name', 'last_name']
 
 
-class SpecialtyListSerializer(serializers.ModelSerializer):
+class SpecialtyListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Specialty
         fields = ['id', 'specialty_name']
@@ -84,7 +80,7 @@ class SpecialtySerializer(serializers.ModelSerializer):
         fields = ['specialty_name']
 
 
-class DepartmentListSerializer(serializers.ModelSerializer):
+class DepartmentListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Department
         fields = ['id', 'department_name']
@@ -96,7 +92,7 @@ class DepartmentSerializer(serializers.ModelSerializer):
         fields = ['department_name']
 
 
-class PatientProfileListSerializer(serializers.ModelSerializer):
+class PatientProfileListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserProfilePatientSerializer()
 
     class Meta:
@@ -104,7 +100,7 @@ class PatientProfileListSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'emergency_contact', 'blood_type']
 
 
-class PatientProfileDetailSerializer(serializers.ModelSerializer):
+class PatientProfileDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserProfilePatientSerializer()
 
     class Meta:
@@ -120,7 +116,7 @@ class PatientProfileAppointmentSerializer(serializers.ModelSerializer):
         fields = ['user']
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     patient = PatientProfileAppointmentSerializer()
     doctor = UserProfileAppointmentSerializer()
     date_time = serializers.DateTimeField(format('%d-%B-%Y %H:%M'))
@@ -130,7 +126,29 @@ class AppointmentSerializer(serializers.ModelSerializer):
         fields = ['id', 'patient', 'doctor', 'date_time', 'status']
 
 
-class MedicalRecordSerializer(serializers.ModelSerializer):
+class AppointmentConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'This doctor already has an appointment at this time.'
+    default_code = 'appointment_conflict'
+
+
+class AppointmentCreateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Appointment
+        fields = ['id', 'patient', 'doctor', 'date_time', 'status']
+        validators = []
+
+    def validate(self, data):
+        if data['status'] != 'cancelled' and Appointment.objects.filter(
+                doctor=data['doctor'], date_time=data['date_time']).exclude(status='cancelled').exists():
+            raise AppointmentConflict()
+        return data
+
+    def to_representation(self, instance):
+        return AppointmentSerializer(instance, context=self.context).data
+
+
+class MedicalRecordSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     patient = PatientProfileAppointmentSerializer()
     doctor = UserProfileAppointmentSerializer()
 
@@ -140,7 +158,7 @@ class MedicalRecordSerializer(serializers.ModelSerializer):
                   'prescribed_medication', 'created_at']
 
 
-class FeedbackSerializer(serializers.ModelSerializer):
+class FeedbackSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     patient = PatientProfileAppointmentSerializer()
     doctor = UserProfileAppointmentSerializer()
     created_at = serializers.DateTimeField(format('%d-%b-%Y %H:%M'))
@@ -152,34 +170,326 @@ class FeedbackSerializer(serializers.ModelSerializer):
 
 
 
-class DoctorProfileListSerializer(serializers.ModelSerializer):
+class MessageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author = PatientProfileAppointmentSerializer(allow_null=True)
+    doctor = UserProfileAppointmentSerializer(allow_null=True)
+    created_date = serializers.DateTimeField(format('%d-%b-%Y %H:%M'))
+    image_variants = ImageVariantsField()
+
+    class Meta:
+        model = Message
+        fields = ['id', 'chat', 'author', 'doctor', 'text', 'image', 'image_variants', 'video', 'created_date']
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'The upload is larger than allowed.'
+    default_code = 'upload_too_large'
+
+
+class ChatUploadSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received', read_only=True)
+    chunk_size = serializers.SerializerMethodField()
+    message = MessageSerializer(read_only=True)
+
+    class Meta:
+        model = ChatUpload
+        fields = ['id', 'chat', 'kind', 'filename', 'size', 'offset', 'chunk_size', 'message', 'created_at']
+        read_only_fields = ['chat', 'kind']
+        extra_kwargs = {'size': {'min_value': 1}}
+
+    def get_chunk_size(self, obj):
+        return settings.CHAT_UPLOAD_CHUNK_SIZE
+
+    def validate(self, attrs):
+        filename = attrs['filename'].replace('\\', '/').rsplit('/', 1)[-1]
+        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        kind = 'image' if extension in IMAGE_EXTENSIONS else 'video' if extension in VIDEO_EXTENSIONS else None
+        if kind is None:
+            raise serializers.ValidationError(
+                {'filename': f'Allowed extensions: {", ".join(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS)}.'})
+        if attrs['size'] > settings.CHAT_UPLOAD_MAX_SIZE[kind]:
+            raise UploadTooLarge(f'{kind.capitalize()}s are limited to {settings.CHAT_UPLOAD_MAX_SIZE[kind]} bytes.')
+        attrs.update(filename=filename, kind=kind)
+        return attrs
+
+
+class DoctorProfileListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     specialty = SpecialtySerializer(many=True, read_only=True)
     department = DepartmentSerializer(many=True, read_only=True)
-    avg_rating = serializers.SerializerMethodField()
+    profile_picture_variants = ImageVariantsField()
+    expandable_fields = {
+        'comment_count': serializers.IntegerField(source='get_comment_count', read_only=True),
+        'experience': serializers.IntegerField(read_only=True),
+        'gender': serializers.BooleanField(read_only=True),
+        'doctor_information': serializers.CharField(read_only=True),
+    }
+    sparse_sources = {'comment_count': ['comment_count']}
 
     class Meta:
         model = DoctorProfile
-        fields = ['id', 'first_name', 'last_name', 'specialty', 'department',
+        fields = ['id', 'first_name', 'last_name', 'profile_picture_variants', 'specialty', 'department',
                   'price', 'working_days', 'avg_rating']
 
-    def get_avg_rating(self, obj):
-        return obj.get_avg_rating()
-
 
-class DoctorProfileDetailSerializer(serializers.ModelSerializer):
+class DoctorProfileDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     specialty = SpecialtySerializer(many=True, read_only=True)
     department = DepartmentSerializer(many=True, read_only=True)
-    avg_rating = serializers.SerializerMethodField()
     comment_count = serializers.SerializerMethodField()
+    profile_picture_variants = ImageVariantsField()
+    sparse_sources = {'comment_count': ['comment_count']}
 
     class Meta:
         model = DoctorProfile
-        fields = ['first_name', 'last_name', 'age', 'phone_number', 'profile_picture', 'specialty', 'department',
-                  'shift_start', 'shift_end', 'working_days', 'role', 'doctor_information', 'experience', 'gender', 'price', 'avg_rating', 'comment_count']
-
-    def get_avg_rating(self, obj):
-        return obj.get_avg_rating()
+        fields = ['first_name', 'last_name', 'age', 'phone_number', 'profile_picture', 'profile_picture_variants',
+                  'specialty', 'department', 'shift_start', 'shift_end', 'working_days', 'role', 'doctor_information', 'experience', 'gender', 'price', 'avg_rating', 'comment_count']
 
     def get_comment_count(self, obj):
         return obj.get_comment_count()
 
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    doctor = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def validate(self, data):
+        data.setdefault('start', datetime.date.today())
+        data.setdefault('end', data['start'] + datetime.timedelta(days=6))
+        if data['end'] < data['start']:
+            raise serializers.ValidationError('end must not be before start')
+        max_days = getattr(settings, 'AVAILABILITY_MAX_DAYS', 31)
+        if (data['end'] - data['start']).days >= max_days:
+            raise serializers.ValidationError(f'Date range is limited to {max_days} days')
+        return data
+
+
+def add_item_error(errors, index, field, message):
+    errors[index].setdefault(field, []).append(str(message))
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    Validate and write a JSON array as one batch.
+
+    Items go through field validation one by one, then the child's
+    `validate_batch()` checks the whole batch with one query per related
+    model. Errors come back as a list aligned with the input, `{}` for the
+    valid items. Pass the queryset as `instance` to update by `id`.
+    """
+
+    def run_child_validation(self, data):
+        try:
+            item = self.child.run_validation(data)
+        except serializers.ValidationError as exc:
+            self.item_errors.append(exc.detail)
+            return None
+        self.item_errors.append({})
+        return item
+
+    def to_internal_value(self, data):
+        self.item_errors = []
+        self.instances = {}
+        self.items = items = super().to_internal_value(data)
+        self.child.validate_batch(items, self.item_errors)
+        if any(self.item_errors):
+            raise serializers.ValidationError(self.item_errors)
+        self.child.prepare_batch(items)
+        return items
+
+    def create(self, validated_data):
+        return self.child.bulk_create(validated_data)
+
+    def update(self, instance, validated_data):
+        return self.child.bulk_update(validated_data)
+
+
+class BulkSerializerMixin:
+    bulk_related = {}
+    bulk_unique = ()
+
+    @property
+    def bulk_batch_size(self):
+        return getattr(settings, 'BULK_BATCH_SIZE', 500)
+
+    def validate_batch(self, items, errors):
+        model = self.Meta.model
+        if self.parent.instance is not None:
+            self.parent.instances = self.parent.instance.in_bulk(
+                [item['id'] for item in items if item and 'id' in item])
+            for index, item in enumerate(items):
+                if item is not None and item.get('id') not in self.parent.instances:
+                    add_item_error(errors, index, 'id', 'Object with this id does not exist.')
+
+        for name, related_model in self.bulk_related.items():
+            source = self.fields[name].source
+            found = set(related_model.objects.filter(
+                pk__in={item[source] for item in items if item and source in item}).values_list('pk', flat=True))
+            for index, item in enumerate(items):
+                if item and source in item and item[source] not in found:
+                    add_item_error(errors, index, name, serializers.PrimaryKeyRelatedField.default_error_messages[
+                        'does_not_exist'].format(pk_value=item[source]))
+
+        for name in self.bulk_unique:
+            seen = {}
+            for index, item in enumerate(items):
+                if item and name in item:
+                    if item[name] in seen:
+                        add_item_error(errors, index, name, f'Duplicate {name} in this batch.')
+                    seen.setdefault(item[name], index)
+            # Check the table that holds the column: DoctorProfile.username is unique among all UserProfiles
+            owner = model._meta.get_field(name).model
+            taken = owner._default_manager.filter(**{f'{name}__in': list(seen)}).exclude(
+                pk__in=list(self.parent.instances)).values_list(name, flat=True)
+            for value in taken:
+                add_item_error(errors, seen[value], name, f'{owner._meta.verbose_name} with this {name} already exists.')
+
+    def prepare_batch(self, items):
+        """Slow per-item work on a valid batch, done before save() opens the write transaction."""
+
+    def apply_items(self, items):
+        objs, fields = [], set()
+        for item in items:
+            obj = self.parent.instances[item.pop('id')]
+            for field, value in item.items():
+                setattr(obj, field, value)
+            fields.update(item)
+            objs.append(obj)
+        return objs, fields
+
+    def bulk_create(self, items):
+        model = self.Meta.model
+        objs = [model(**{field: value for field, value in item.items() if field != 'id'}) for item in items]
+        return model.objects.bulk_create(objs, batch_size=self.bulk_batch_size)
+
+    def bulk_update(self, items):
+        objs, fields = self.apply_items(items)
+        if fields:
+            self.Meta.model.objects.bulk_update(objs, fields, batch_size=self.bulk_batch_size)
+        return objs
+
+
+class AppointmentBulkSerializer(BulkSerializerMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    patient = serializers.IntegerField(source='patient_id')
+    doctor = serializers.IntegerField(source='doctor_id')
+    bulk_related = {'patient': PatientProfile, 'doctor': DoctorProfile}
+
+    class Meta:
+        model = Appointment
+        fields = ['id', 'patient', 'doctor', 'date_time', 'status']
+        list_serializer_class = BulkListSerializer
+        validators = []
+
+    def validate_batch(self, items, errors):
+        super().validate_batch(items, errors)
+        instances = self.parent.instances
+        slots = {}
+        for index, item in enumerate(items):
+            if not item or errors[index]:
+                continue
+            instance = instances.get(item.get('id'))
+            doctor_id, date_time, state = (item[field] if field in item else getattr(instance, field)
+                                           for field in ('doctor_id', 'date_time', 'status'))
+            if state == 'cancelled':
+                continue
+            if (doctor_id, date_time) in slots:
+                add_item_error(errors, index, api_settings.NON_FIELD_ERRORS_KEY, AppointmentConflict.default_detail)
+            slots.setdefault((doctor_id, date_time), index)
+        if not slots:
+            return
+        taken = Appointment.objects.filter(
+            doctor_id__in={doctor_id for doctor_id, _ in slots}, date_time__in={date_time for _, date_time in slots},
+        ).exclude(status='cancelled').exclude(pk__in=list(instances)).values_list('doctor_id', 'date_time')
+        for slot in taken:
+            if slot in slots:
+                add_item_error(errors, slots[slot], api_settings.NON_FIELD_ERRORS_KEY, AppointmentConflict.default_detail)
+
+
+class MedicalRecordBulkSerializer(BulkSerializerMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    patient = serializers.IntegerField(source='patient_id')
+    doctor = serializers.IntegerField(source='doctor_id')
+    bulk_related = {'patient': PatientProfile, 'doctor': DoctorProfile}
+
+    class Meta:
+        model = MedicalRecord
+        fields = ['id', 'patient', 'doctor', 'diagnosis', 'treatment', 'prescribed_medication', 'created_at']
+        list_serializer_class = BulkListSerializer
+
+
+class DoctorProfileBulkSerializer(BulkSerializerMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    password = serializers.CharField(write_only=True, required=False)
+    specialty = serializers.ListField(child=serializers.IntegerField(), required=False)
+    department = serializers.ListField(child=serializers.CharField(max_length=64), required=False)
+    working_days = serializers.ListField(child=serializers.ChoiceField(choices=DoctorProfile.DAY_CHOICES),
+                                         max_length=5)
+    bulk_unique = ('username',)
+
+    class Meta:
+        model = DoctorProfile
+        fields = ['id', 'username', 'password', 'email', 'first_name', 'last_name', 'age', 'phone_number',
+                  'specialty', 'department', 'shift_start', 'shift_end', 'working_days', 'doctor_information',
+                  'experience', 'gender', 'price']
+        list_serializer_class = BulkListSerializer
+        extra_kwargs = {'username': {'validators': [UserProfile.username_validator]}}
+
+    def validate_batch(self, items, errors):
+        super().validate_batch(items, errors)
+        found = set(Specialty.objects.filter(
+            pk__in={pk for item in items if item for pk in item.get('specialty', [])}).values_list('pk', flat=True))
+        for index, item in enumerate(items):
+            for pk in (item or {}).get('specialty', []):
+                if pk not in found:
+                    add_item_error(errors, index, 'specialty', serializers.PrimaryKeyRelatedField.default_error_messages[
+                        'does_not_exist'].format(pk_value=pk))
+
+    def prepare_batch(self, items):
+        """Hash the passwords, all in one hash_passwords() call; new doctors without one get an unusable one."""
+        passwords = [item.get('password') for item in items]
+        creating = self.parent.instance is None
+        for item, password, hashed in zip(items, passwords, hash_passwords(passwords)):
+            if password or creating:
+                item['password'] = hashed
+
+    def bulk_create(self, items):
+        links = [(item.pop('specialty', None), item.pop('department', None)) for item in items]
+        doctors = []
+        for item in items:
+            item.pop('id', None)
+            doctors.append(DoctorProfile(**item))
+        DoctorProfile.objects.bulk_create_doctors(doctors, batch_size=self.bulk_batch_size)
+        self.set_links(doctors, links)
+        return doctors
+
+    def bulk_update(self, items):
+        links = [(item.pop('specialty', None), item.pop('department', None)) for item in items]
+        doctors, fields = self.apply_items(items)
+        if 'working_days' in fields:
+            for doctor in doctors:
+                doctor.working_days_mask = DoctorProfile.days_to_mask(doctor.working_days)
+            fields.add('working_days_mask')
+        if fields:
+            DoctorProfile.objects.bulk_update(doctors, fields, batch_size=self.bulk_batch_size)
+        self.set_links(doctors, links)
+        return doctors
+
+    def set_links(self, doctors, links):
+        """Replace specialties and departments given in the batch; bulk writes skip signals, so reindex here."""
+        specialties = {doctor.pk: ids for doctor, (ids, _) in zip(doctors, links) if ids is not None}
+        departments = {doctor.pk: names for doctor, (_, names) in zip(doctors, links) if names is not None}
+        through = Specialty.doctor.through
+        if specialties:
+            through.objects.filter(doctorprofile_id__in=list(specialties)).delete()
+            through.objects.bulk_create([through(doctorprofile_id=pk, specialty_id=specialty_id)
+                                         for pk, ids in specialties.items() for specialty_id in dict.fromkeys(ids)],
+                                        batch_size=self.bulk_batch_size)
+        if departments:
+            stale = Department.objects.filter(doctor_id__in=list(departments))
+            stale._raw_delete(stale.db)
+            Department.objects.bulk_create([Department(doctor_id=pk, department_name=name)
+                                            for pk, names in departments.items() for name in names],
+                                           batch_size=self.bulk_batch_size)
+        invalidate('doctors', 'departments', 'specialties', *[f'doctor:{doctor.pk}' for doctor in doctors])
+        index_doctors([doctor.pk for doctor in doctors])
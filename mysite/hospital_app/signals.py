@@ -0,0 +1,97 @@
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .caching import invalidate
+from .images import schedule_variants
+from .models import Department, DoctorProfile, Feedback, Message, Specialty, UserProfile
+from .search import index_doctors, remove_doctors
+
+
+@receiver(post_init, sender=Feedback)
+def remember_feedback_doctor(sender, instance, **kwargs):
+    instance._loaded_doctor_id = instance.__dict__.get('doctor_id')
+
+
+@receiver(post_save, sender=Feedback)
+def update_doctor_rating_on_save(sender, instance, raw=False, **kwargs):
+    doctor_ids = {instance.doctor_id, instance._loaded_doctor_id} - {None}
+    invalidate('doctors', *[f'doctor:{pk}' for pk in doctor_ids])
+    if raw:
+        return
+    DoctorProfile.refresh_ratings(doctor_ids)
+    instance._loaded_doctor_id = instance.doctor_id
+
+
+@receiver(post_delete, sender=Feedback)
+def update_doctor_rating_on_delete(sender, instance, **kwargs):
+    invalidate('doctors', f'doctor:{instance.doctor_id}')
+    DoctorProfile.refresh_ratings({instance.doctor_id})
+
+
+@receiver(post_save, sender=DoctorProfile)
+def doctor_saved(sender, instance, **kwargs):
+    invalidate('doctors', f'doctor:{instance.pk}')
+    index_doctors([instance.pk])
+
+
+@receiver(post_save, sender=UserProfile)
+def user_saved(sender, instance, raw=False, **kwargs):
+    """A doctor's names can be edited through its UserProfile row; that save does not send DoctorProfile's signal."""
+    if DoctorProfile.objects.filter(pk=instance.pk).exists():
+        invalidate('doctors', f'doctor:{instance.pk}')
+        if not raw:
+            index_doctors([instance.pk])
+
+
+@receiver(post_delete, sender=DoctorProfile)
+def doctor_deleted(sender, instance, **kwargs):
+    invalidate('doctors', f'doctor:{instance.pk}')
+    remove_doctors([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Department)
+def department_changed(sender, instance, **kwargs):
+    invalidate('departments', 'doctors', f'doctor:{instance.doctor_id}')
+    index_doctors([instance.doctor_id])
+
+
+@receiver(pre_delete, sender=Specialty)
+def remember_specialty_doctors(sender, instance, **kwargs):
+    instance._doctor_ids = list(instance.doctor.values_list('pk', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Specialty)
+def specialty_changed(sender, instance, created=False, **kwargs):
+    doctor_ids = getattr(instance, '_doctor_ids', None)
+    if doctor_ids is None:
+        doctor_ids = [] if created else list(instance.doctor.values_list('pk', flat=True))
+    invalidate('specialties', 'doctors', *[f'doctor:{pk}' for pk in doctor_ids])
+    index_doctors(doctor_ids)
+
+
+@receiver(m2m_changed, sender=Specialty.doctor.through)
+def specialty_doctors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        instance._cleared_ids = list(
+            instance.specialty.values_list('pk', flat=True) if reverse else
+            instance.doctor.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_ids', [])
+    doctor_ids = [instance.pk] if reverse else pk_set
+    invalidate('specialties', 'doctors', *[f'doctor:{pk}' for pk in doctor_ids])
+    index_doctors(doctor_ids)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=DoctorProfile)
+def profile_picture_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'profile_picture')
+
+
+@receiver(post_save, sender=Message)
+def message_image_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'image')
@@ -1,3 +1,222 @@
-from django.test import TestCase
+import datetime
+import tempfile
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from .chat_store import get_chat_author
+from .models import (Appointment, Chat, ChatUpload, Department, DoctorProfile, Feedback, MedicalRecord, Message,
+                     PatientProfile, Specialty, UserProfile)
+from .paginations import DoctorProfilePagination
+from .serializers import UserProfilePatientSerializer
+from .uploads import UploadConflict, finish, part_path
 
-# Create your tests here.
+
+@mock.patch.object(DoctorProfilePagination, 'max_page_size', 100)
+class DoctorListQueryCountTests(TestCase):
+    """The doctor list runs the same number of queries whatever the page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        specialties = Specialty.objects.bulk_create([Specialty(specialty_name=f'Specialty {number}')
+                                                     for number in range(5)])
+        patient = PatientProfile.objects.create(user=UserProfile.objects.create_user(username='patient'),
+                                                emergency_contact='+10000000000', blood_type='A')
+        for number in range(100):
+            doctor = DoctorProfile.objects.create_user(
+                username=f'doctor-{number}', first_name='Ivan', last_name=f'Doctor {number}',
+                shift_start=datetime.time(9), shift_end=datetime.time(17), working_days=['Monday'],
+                price=100 + number)
+            doctor.specialty.add(specialties[number % 5], specialties[(number + 1) % 5])
+            Department.objects.create(doctor=doctor, department_name=f'Department {number % 3}')
+            Feedback.objects.create(patient=patient, doctor=doctor, rating=number % 5 + 1, comment='Fine')
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('doctors_list'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), params['page_size'])
+        return len(queries)
+
+    def assertConstantQueries(self, **params):
+        counts = {size: self.count_queries({**params, 'page_size': size}) for size in range(1, 101)}
+        self.assertEqual(len(set(counts.values())), 1, counts)
+
+    def test_plain_list(self):
+        self.assertConstantQueries(facets='false')
+
+    def test_with_count_and_facets(self):
+        self.assertConstantQueries()
+
+    def test_filtered_searched_and_ordered(self):
+        self.assertConstantQueries(facets='false', working_day='Monday', price__gt=50, search='ivan',
+                                   ordering='-price')
+
+    def test_full_serializers(self):
+        self.assertConstantQueries(facets='false', fast='false')
+
+    def test_keyset_pages(self):
+        with mock.patch('hospital_app.paginations.DoctorProfileKeysetPagination.max_page_size', 100):
+            self.assertConstantQueries(facets='false', pagination='cursor')
+
+
+class BulkOwnershipTests(TestCase):
+    """Bulk appointment and medical record writes are limited to the requesting doctor's rows."""
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor, cls.other_doctor = [DoctorProfile.objects.create_user(
+            username=f'doctor-{number}', shift_start=datetime.time(9), shift_end=datetime.time(17),
+            working_days=['Monday'], price=100) for number in range(2)]
+        cls.patient = PatientProfile.objects.create(user=UserProfile.objects.create_user(username='patient'),
+                                                    emergency_contact='+10000000000', blood_type='A')
+        cls.record = MedicalRecord.objects.create(patient=cls.patient, doctor=cls.doctor, diagnosis='Flu',
+                                                  treatment='Rest', prescribed_medication='Water',
+                                                  created_at=datetime.date(2030, 1, 1))
+        cls.appointment = Appointment.objects.create(
+            patient=cls.patient, doctor=cls.doctor, status='planned',
+            date_time=datetime.datetime(2030, 1, 7, 10, tzinfo=datetime.timezone.utc))
+
+    def patch(self, user, url, data):
+        self.client.force_authenticate(user)
+        return self.client.patch(reverse(url), data, format='json')
+
+    def test_user_without_profile_is_refused(self):
+        response = self.patch(self.patient.user, 'medical_record_bulk', [{'id': self.record.pk, 'diagnosis': 'X'}])
+        self.assertEqual(response.status_code, 403)
+        response = self.patch(self.patient.user, 'appointment_bulk',
+                              [{'id': self.appointment.pk, 'status': 'cancelled'}])
+        self.assertEqual(response.status_code, 403)
+        self.record.refresh_from_db()
+        self.appointment.refresh_from_db()
+        self.assertEqual((self.record.diagnosis, self.appointment.status), ('Flu', 'planned'))
+
+    def test_other_doctor_is_refused(self):
+        response = self.patch(self.other_doctor, 'medical_record_bulk', [{'id': self.record.pk, 'diagnosis': 'X'}])
+        self.assertEqual(response.status_code, 403)
+        response = self.patch(self.other_doctor, 'appointment_bulk',
+                              [{'id': self.appointment.pk, 'status': 'cancelled'}])
+        self.assertEqual(response.status_code, 403)
+        self.record.refresh_from_db()
+        self.assertEqual(self.record.diagnosis, 'Flu')
+
+    def test_doctor_cannot_hand_rows_to_another_doctor(self):
+        response = self.patch(self.doctor, 'medical_record_bulk',
+                              [{'id': self.record.pk, 'doctor': self.other_doctor.pk}])
+        self.assertEqual(response.status_code, 403)
+        self.client.force_authenticate(self.doctor)
+        response = self.client.post(reverse('medical_record_bulk'), [{
+            'patient': self.patient.pk, 'doctor': self.other_doctor.pk, 'diagnosis': 'Flu', 'treatment': 'Rest',
+            'prescribed_medication': 'Water', 'created_at': '2030-01-01'}], format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_owner_updates_own_rows(self):
+        response = self.patch(self.doctor, 'medical_record_bulk', [{'id': self.record.pk, 'diagnosis': 'Cold'}])
+        self.assertEqual(response.status_code, 200)
+        self.record.refresh_from_db()
+        self.assertEqual(self.record.diagnosis, 'Cold')
+
+
+class ImageVariantsTests(TestCase):
+    """A variant manifest is only served for the image it was built from."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manifest = {'source': 'profile_image/old.png', 'sizes': {'thumb': {
+            'width': 160, 'height': 120, 'webp': 'variants/profile_image/old/thumb.webp',
+            'jpeg': 'variants/profile_image/old/thumb.jpeg'}}}
+        cls.user = UserProfile.objects.create_user(username='pictured', profile_picture='profile_image/old.png',
+                                                   profile_picture_variants=cls.manifest)
+
+    def test_manifest_of_the_current_image_is_served(self):
+        data = UserProfilePatientSerializer(self.user).data['profile_picture_variants']
+        self.assertEqual(data['thumb']['width'], 160)
+
+    def test_manifest_of_a_replaced_image_is_hidden(self):
+        self.user.profile_picture = 'profile_image/new.png'
+        self.assertIsNone(UserProfilePatientSerializer(self.user).data['profile_picture_variants'])
+
+    def test_removing_the_image_clears_the_manifest(self):
+        self.user.profile_picture = None
+        self.user.save()
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.profile_picture_variants)
+        self.assertIsNone(UserProfilePatientSerializer(self.user).data['profile_picture_variants'])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), CHAT_UPLOAD_TEMP_DIR=tempfile.mkdtemp())
+class ChatUploadTests(TestCase):
+    """The chunk that completes an upload posts exactly one message, however often it is retried."""
+    client_class = APIClient
+    video = b'\x00\x00\x00\x18ftypmp42' + bytes(100)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = PatientProfile.objects.create(user=UserProfile.objects.create_user(username='patient'),
+                                                    emergency_contact='+10000000000', blood_type='A')
+        cls.chat = Chat.objects.create()
+        cls.chat.patient.add(cls.patient)
+
+    def setUp(self):
+        self.client.force_authenticate(self.patient.user)
+        response = self.client.post(reverse('chat_upload_create', args=[self.chat.pk]),
+                                    {'filename': 'scan.mp4', 'size': len(self.video)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.url = reverse('chat_upload', args=[response.json()['id']])
+
+    def send(self, offset, body):
+        return self.client.patch(self.url, body, content_type='application/offset+octet-stream',
+                                 HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_retried_last_chunk_is_refused(self):
+        response = self.send(0, self.video)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['message'])
+        self.assertEqual(self.send(len(self.video), b'').status_code, 409)
+        self.assertEqual(Message.objects.filter(chat=self.chat).count(), 1)
+
+    def test_completion_is_claimed_once(self):
+        upload = ChatUpload.objects.get()
+        self.send(0, self.video)
+        with open(part_path(upload), 'wb') as part:
+            part.write(self.video)
+        with self.assertRaises(UploadConflict):
+            finish(upload)
+        self.assertEqual(Message.objects.filter(chat=self.chat).count(), 1)
+
+
+class ChatAuthorTests(TestCase):
+    """Both the patients and the doctors of a chat are stored as the authors of their messages."""
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = DoctorProfile.objects.create_user(
+            username='doctor', first_name='Aigerim', shift_start=datetime.time(9), shift_end=datetime.time(17),
+            working_days=['Monday'], price=100)
+        cls.patient = PatientProfile.objects.create(user=UserProfile.objects.create_user(username='patient'),
+                                                    emergency_contact='+10000000000', blood_type='A')
+        cls.chat = Chat.objects.create()
+        cls.chat.person.add(cls.doctor)
+        cls.chat.patient.add(cls.patient)
+
+    def test_members_resolve_to_their_profile(self):
+        room = str(self.chat.pk)
+        self.assertEqual(async_to_sync(get_chat_author)(room, self.doctor),
+                         (self.chat.pk, {'doctor_id': self.doctor.pk}))
+        self.assertEqual(async_to_sync(get_chat_author)(room, self.patient.user),
+                         (self.chat.pk, {'author_id': self.patient.pk}))
+
+    def test_history_names_the_doctor(self):
+        Message.objects.create(chat=self.chat, doctor=self.doctor, text='Hello')
+        self.client.force_authenticate(self.doctor)
+        message, = self.client.get(reverse('chat_messages', args=[self.chat.pk])).json()['results']
+        self.assertEqual((message['author'], message['doctor']['first_name']), (None, 'Aigerim'))
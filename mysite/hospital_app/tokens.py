@@ -0,0 +1,174 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+logger = logging.getLogger(__name__)
+
+
+class BlacklistCache:
+    """
+    Blacklist lookups in front of the token_blacklist tables.
+
+    Blacklisted jtis live in a local set and in the shared Django cache until
+    the token itself expires; the shared cache is what carries a logout to
+    the other workers. "Not blacklisted" answers are only cached for
+    JWT_BLACKLIST_NEGATIVE_SECONDS so a logout elsewhere is seen quickly.
+    """
+
+    def __init__(self):
+        self.local = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(jti):
+        return f'jwt-blacklist:{jti}'
+
+    def remember(self, jti, exp):
+        ttl = exp - time.time()
+        if ttl <= 0:
+            return
+        with self.lock:
+            self.local[jti] = exp
+        cache.set(self.key(jti), True, int(ttl) + 1)
+
+    def is_blacklisted(self, jti, exp):
+        now = time.time()
+        with self.lock:
+            local_exp = self.local.get(jti)
+            if local_exp is not None:
+                if local_exp > now:
+                    return True
+                del self.local[jti]
+
+        cached = cache.get(self.key(jti))
+        if cached is None:
+            cached = jti in blacklist_writer.pending_jtis() or \
+                BlacklistedToken.objects.filter(token__jti=jti).exists()
+            timeout = exp - now if cached else min(exp - now, settings.JWT_BLACKLIST_NEGATIVE_SECONDS)
+            cache.set(self.key(jti), cached, max(int(timeout), 1))
+        if cached:
+            with self.lock:
+                self.local[jti] = exp
+        return cached
+
+    def prune(self):
+        now = time.time()
+        with self.lock:
+            self.local = {jti: exp for jti, exp in self.local.items() if exp > now}
+
+
+class BlacklistWriter:
+    """
+    Background thread that stores logouts in batches with bulk_create.
+
+    A batch that fails stays pending (so this process still treats its
+    tokens as blacklisted) and is queued again after a doubling delay,
+    capped at `max_backoff` seconds, until it is stored.
+    """
+
+    def __init__(self, batch_size=200, flush_interval=1.0, max_backoff=60.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.queue = queue.Queue()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def add(self, token):
+        jti = token[api_settings.JTI_CLAIM]
+        row = {
+            'jti': jti,
+            'user_id': token.get(api_settings.USER_ID_CLAIM),
+            'token': str(token),
+            'created_at': token.current_time,
+            'expires_at': datetime_from_epoch(token['exp']),
+        }
+        with self.lock:
+            self.pending[jti] = row
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='jwt-blacklist-writer', daemon=True)
+                self.thread.start()
+        self.queue.put(jti)
+
+    def pending_jtis(self):
+        with self.lock:
+            return set(self.pending)
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+                self.failures = 0
+            except Exception:
+                self.failures += 1
+                delay = min(self.flush_interval * 2 ** self.failures, self.max_backoff)
+                logger.exception('Could not store %d blacklisted tokens (attempt %d), retrying in %.1fs',
+                                 len(batch), self.failures, delay)
+                close_old_connections()
+                time.sleep(delay)
+                for jti in batch:
+                    self.queue.put(jti)
+            finally:
+                close_old_connections()
+
+    def write(self, jtis):
+        with self.lock:
+            rows = [self.pending[jti] for jti in jtis if jti in self.pending]
+        if not rows:
+            return
+        with transaction.atomic():
+            OutstandingToken.objects.bulk_create([OutstandingToken(**row) for row in rows], ignore_conflicts=True)
+            tokens = OutstandingToken.objects.filter(jti__in=[row['jti'] for row in rows]).only('id')
+            BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in tokens],
+                                                 ignore_conflicts=True)
+        with self.lock:
+            for row in rows:
+                self.pending.pop(row['jti'], None)
+
+    def flush(self):
+        with self.lock:
+            jtis = list(self.pending)
+        if jtis:
+            self.write(jtis)
+
+
+blacklist_cache = BlacklistCache()
+blacklist_writer = BlacklistWriter(
+    batch_size=getattr(settings, 'JWT_BLACKLIST_BATCH_SIZE', 200),
+    flush_interval=getattr(settings, 'JWT_BLACKLIST_FLUSH_INTERVAL', 1.0),
+    max_backoff=getattr(settings, 'JWT_BLACKLIST_MAX_BACKOFF', 60.0),
+)
+atexit.register(blacklist_writer.flush)
+
+
+class CachedRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        if blacklist_cache.is_blacklisted(self.payload[api_settings.JTI_CLAIM], self.payload['exp']):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        blacklist_cache.remember(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+        blacklist_writer.add(self)
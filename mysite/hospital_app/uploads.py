@@ -0,0 +1,168 @@
+import os
+import uuid
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.db import transaction
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, UnsupportedMediaType
+from .models import ChatUpload, Message
+from .serializers import MessageSerializer, UploadTooLarge
+
+CHUNK_CONTENT_TYPE = 'application/offset+octet-stream'
+BLOCK_SIZE = 64 * 1024
+SNIFF_SIZE = 16
+
+
+class UploadConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Upload-Offset does not match the bytes received so far.'
+    default_code = 'upload_offset_mismatch'
+
+
+class LengthRequired(APIException):
+    status_code = status.HTTP_411_LENGTH_REQUIRED
+    default_detail = 'Chunks need a Content-Length header.'
+    default_code = 'length_required'
+
+
+def looks_like(kind, head):
+    """Check the first bytes of the file against the image and video containers the chat accepts."""
+    if kind == 'image':
+        return (head.startswith((b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF87a', b'GIF89a'))
+                or head[:4] == b'RIFF' and head[8:12] == b'WEBP')
+    return head[4:8] == b'ftyp' or head.startswith(b'\x1a\x45\xdf\xa3')
+
+
+def part_path(upload):
+    return os.path.join(settings.CHAT_UPLOAD_TEMP_DIR, f'{upload.pk}.part')
+
+
+def discard(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def chunk_length(request, upload, offset):
+    if request.content_type != CHUNK_CONTENT_TYPE:
+        raise UnsupportedMediaType(request.content_type)
+    try:
+        length = int(request.META['CONTENT_LENGTH'])
+    except (KeyError, ValueError):
+        raise LengthRequired
+    if length > settings.CHAT_UPLOAD_CHUNK_SIZE:
+        raise UploadTooLarge(f'Chunks are limited to {settings.CHAT_UPLOAD_CHUNK_SIZE} bytes.')
+    if offset + length > upload.size:
+        raise UploadTooLarge(f'The upload was declared as {upload.size} bytes.')
+    return length
+
+
+def write_chunk(request, upload, offset):
+    """
+    Append the request body to the part file at `offset`, BLOCK_SIZE bytes at
+    a time, and return the new offset. A client that disconnects keeps what
+    arrived and resumes from there. One chunk per upload at a time; a
+    parallel one gets a 409. The chunk that completes the upload finishes it
+    before the lock is released, so a retried last chunk gets a 409 too.
+
+    The one-chunk-at-a-time lock is a cache.add(), so it only holds across
+    workers with a shared cache (CACHE_REDIS_URL); with the LocMem default
+    it holds within one process. Under WSGI the checks run before the body
+    is read and the body goes from the socket to the part file. Under ASGI
+    Django has already spooled the whole body (to memory, then to a
+    temporary file past FILE_UPLOAD_MAX_MEMORY_SIZE) before the view runs,
+    so a rejected chunk has been received anyway and the part file is
+    filled from that spool; cap chunk bodies at the proxy as well.
+    """
+    length = chunk_length(request, upload, offset)
+    lock = f'chat-upload:{upload.pk}'
+    if not cache.add(lock, True, timeout=600):
+        raise UploadConflict('Another chunk of this upload is being received.')
+    try:
+        upload.refresh_from_db(fields=['received', 'message'])
+        if upload.message_id is not None:
+            raise UploadConflict('This upload is already complete.')
+        if offset != upload.received:
+            raise UploadConflict
+        stream = request.stream
+        pending = b''
+        if offset == 0 and length:
+            while len(pending) < min(SNIFF_SIZE, length) and (block := stream.read(SNIFF_SIZE - len(pending))):
+                pending += block
+            if not looks_like(upload.kind, pending):
+                discard(upload)
+                raise UnsupportedMediaType(upload.filename, f'This is not a supported {upload.kind} file.')
+        os.makedirs(settings.CHAT_UPLOAD_TEMP_DIR, exist_ok=True)
+        written = 0
+        with open(part_path(upload), 'r+b' if offset else 'wb') as part:
+            part.seek(offset)
+            part.truncate()
+            while written < length:
+                block = pending or stream.read(min(BLOCK_SIZE, length - written))
+                pending = b''
+                if not block:
+                    break
+                part.write(block)
+                written += len(block)
+        ChatUpload.objects.filter(pk=upload.pk, received=offset).update(received=offset + written)
+        upload.received = offset + written
+        if upload.received == upload.size:
+            finish(upload)
+    finally:
+        cache.delete(lock)
+    return upload.received
+
+
+class PartFile(File):
+    """The finished part file; FileSystemStorage moves it into MEDIA_ROOT instead of copying it."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def finish(upload):
+    """
+    Move the complete file into storage, attach it to a new chat Message and
+    announce it. Only called under the chunk lock; the upload row is still
+    claimed with a conditional UPDATE, so it never gets a second message.
+    """
+    path = part_path(upload)
+    if not os.path.exists(path):
+        raise UploadConflict('The received data is gone; start the upload again.')
+    if upload.kind == 'image':
+        try:
+            with Image.open(path) as image:
+                image.verify()
+        except Exception:
+            discard(upload)
+            raise UnsupportedMediaType(upload.filename, 'The image is damaged or not an image.')
+    message = Message(chat_id=upload.chat_id, author_id=upload.author_id)
+    with open(path, 'rb') as part:
+        getattr(message, upload.kind).save(upload.filename, PartFile(part, name=upload.filename), save=False)
+    if os.path.exists(path):
+        os.remove(path)
+    attachment = getattr(message, upload.kind)
+    try:
+        with transaction.atomic():
+            message.save()
+            if not ChatUpload.objects.filter(pk=upload.pk, message=None).update(message=message):
+                raise UploadConflict('This upload is already complete.')
+            transaction.on_commit(lambda: announce(message), robust=True)
+    except Exception:
+        attachment.delete(save=False)
+        raise
+    upload.message = message
+    return message
+
+
+def announce(message):
+    """Send the new attachment to everyone in the chat's room, like ChatConsumer does for text messages."""
+    attachment = MessageSerializer(Message.objects.select_related('author__user', 'doctor').get(pk=message.pk)).data
+    event = {'type': 'chat.attachment', 'id': uuid.uuid4().hex, 'attachment': attachment}
+    async_to_sync(get_channel_layer().group_send)(f'chat_{message.chat_id}', event)
@@ -1,6 +1,7 @@
 from rest_framework import routers
 from django.urls import path, include
 from .views import *
+from .async_views import *
 
 router = routers.SimpleRouter()
 router.register(r'users', UserProfileViewSet, basename='user_list')
@@ -10,7 +11,11 @@ urlpatterns = [
     path('', include(router.urls)),
     path('doctors/', DoctorProfileListAPIView.as_view(), name='doctors_list'),
     path('doctor/<int:pk>/', DoctorProfileDetailAPIView.as_view(), name='doctor_detail'),
+    path('doctor/<int:pk>/availability/', DoctorAvailabilityAPIView.as_view(), name='doctor_availability'),
+    path('availability/', DoctorAvailabilityAPIView.as_view(), name='availability'),
     path('doctor_create/', DoctorProfileCreateAPIView.as_view(), name='doctor_create'),
+    path('doctor_bulk/', DoctorProfileBulkAPIView.as_view(), name='doctor_bulk'),
+    path('doctor_import/', DoctorImportAPIView.as_view(), name='doctor_import'),
 
     path('departments/', DepartmentListAPIView.as_view(), name='departments_list'),
     path('specialties/', SpecialtyListAPIView.as_view(), name='specialties_list'),
@@ -21,15 +26,26 @@ urlpatterns = [
 
     path('appointment/', AppointmentListAPIView.as_view(), name='appointment_list'),
     path('appointment_create/', AppointmentCreateAPIView.as_view(), name='appointment_create'),
+    path('appointment_bulk/', AppointmentBulkAPIView.as_view(), name='appointment_bulk'),
 
     path('medical_records/', MedicalRecordListAPIView.as_view(), name='medical_records_list'),
     path('medical_record_create/', MedicalRecordCreateAPIView.as_view(), name='medical_record_create'),
+    path('medical_record_bulk/', MedicalRecordBulkAPIView.as_view(), name='medical_record_bulk'),
     path('medical_record/<int:pk>/', MedicalRecordRetrieveAPIView.as_view(), name='medical_record_retrieve'),
 
     path('feedbacks/', FeedbackListAPIView.as_view(), name='feedbacks_list'),
     path('feedback_create/', FeedbackCreateAPIView.as_view(), name='feedback_create'),
     path('feedback/<int:pk>/', FeedbackRetrieveAPIView.as_view(), name='feedback_retrieve'),
 
+    path('async/doctors/', DoctorProfileListAsyncView.as_view(), name='async_doctors_list'),
+    path('async/doctor/<int:pk>/', DoctorProfileDetailAsyncView.as_view(), name='async_doctor_detail'),
+    path('async/appointment/', AppointmentListAsyncView.as_view(), name='async_appointment_list'),
+    path('async/feedbacks/', FeedbackListAsyncView.as_view(), name='async_feedbacks_list'),
+
+    path('chat/<int:pk>/messages/', ChatMessageListAPIView.as_view(), name='chat_messages'),
+    path('chat/<int:pk>/uploads/', ChatUploadCreateAPIView.as_view(), name='chat_upload_create'),
+    path('chat/uploads/<uuid:pk>/', ChatUploadAPIView.as_view(), name='chat_upload'),
+
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', CustomLoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
@@ -1,14 +1,29 @@
 from rest_framework import viewsets, generics, permissions, status, pagination
 from .serializers import *
 from .models import *
-from .permissions import CheckDoctorProfile, CheckPatientProfile
+from .permissions import CheckChatMember, CheckDoctorProfile, CheckPatientProfile, IsDoctorOrAdmin
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from .filters import DoctorProfileFilter
-from .paginations import DoctorProfilePagination, PatientProfilePagination, SpecialtyPagination, DepartmentPagination
+from .filters import DoctorProfileFilter, DoctorSearchFilter
+from .availability import doctor_availability, schedule_queryset
+from .paginations import (AvailabilityPagination, DoctorProfilePagination, PatientProfilePagination, SpecialtyPagination, DepartmentPagination,
+                          AppointmentPagination, MedicalRecordPagination, SelectablePaginationMixin,
+                          DoctorProfileKeysetPagination, PatientProfileKeysetPagination,
+                          AppointmentKeysetPagination, MedicalRecordKeysetPagination, MessageKeysetPagination)
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import CachedRefreshToken
+from .caching import CachedResponseMixin
+from .facets import doctor_facets
+from .fieldsets import SparseQuerysetMixin
+from .fastpath import FastListMixin
+from .exports import APPOINTMENT_COLUMNS, MEDICAL_RECORD_COLUMNS, StreamingExportMixin
+from .imports import IMPORT_FORMATS, detect_format, import_doctors
+from .uploads import UploadConflict, discard, write_chunk
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
 
 
 class RegisterView(generics.CreateAPIView):
@@ -39,52 +54,177 @@ class LogoutView(generics.GenericAPIView):
     def post(self, request, *args, **kwargs):
         try:
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
+            token = CachedRefreshToken(refresh_token)
             token.blacklist()
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserProfileViewSet(viewsets.ModelViewSet):
+class UserProfileViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = UserProfile.objects.all()
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
-        return UserProfile.objects.filter(id=self.request.user.id)
+        return super().get_queryset().filter(id=self.request.user.id)
 
 
-class DoctorProfileListAPIView(generics.ListAPIView):
-    queryset = DoctorProfile.objects.all()
+class DoctorProfileListAPIView(CachedResponseMixin, FastListMixin, SparseQuerysetMixin, SelectablePaginationMixin,
+                               generics.ListAPIView):
+    queryset = DoctorProfile.objects.for_catalog()
     serializer_class = DoctorProfileListSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, DoctorSearchFilter, OrderingFilter]
     filterset_class = DoctorProfileFilter
-    search_fields = ['price', 'working_days']
     ordering_fields = ['price']
     pagination_class = DoctorProfilePagination
+    keyset_pagination_class = DoctorProfileKeysetPagination
+    cache_namespaces = ('doctors',)
 
+    def filter_queryset(self, queryset):
+        self.filtered_queryset = super().filter_queryset(queryset)
+        return self.filtered_queryset
 
-class DoctorProfileDetailAPIView(generics.RetrieveAPIView):
-    queryset = DoctorProfile.objects.all()
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if isinstance(response.data, dict) and request.query_params.get('facets', '').lower() not in ('0', 'false', 'no'):
+            response.data['facets'] = doctor_facets(self.filtered_queryset)
+        return response
+
+
+class DoctorProfileDetailAPIView(CachedResponseMixin, SparseQuerysetMixin, generics.RetrieveAPIView):
+    queryset = DoctorProfile.objects.for_catalog()
     serializer_class = DoctorProfileDetailSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def get_cache_namespaces(self):
+        return (f'doctor:{self.kwargs["pk"]}',)
+
+
+class DoctorAvailabilityAPIView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = DoctorProfileFilter
+    pagination_class = AvailabilityPagination
+
+    def get_queryset(self):
+        return schedule_queryset()
+
+    def get(self, request, *args, **kwargs):
+        params = AvailabilityQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data['start'], params.validated_data['end']
+        if 'pk' in kwargs:
+            doctor = self.get_object()
+            return Response({'doctor': doctor.pk, 'slots': doctor_availability([doctor], start, end)[doctor.pk]})
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if params.validated_data.get('doctor'):
+            queryset = queryset.filter(pk__in=params.validated_data['doctor'])
+        page = self.paginate_queryset(queryset)
+        doctors = page if page is not None else list(queryset)
+        slots = doctor_availability(doctors, start, end)
+        data = [{'doctor': doctor.pk, 'slots': slots[doctor.pk]} for doctor in doctors]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
 
 class DoctorProfileCreateAPIView(generics.CreateAPIView):
     serializer_class = DoctorProfileDetailSerializer
     permission_classes = [permissions.IsAdminUser]
 
 
-class PatientProfileListAPIView(generics.ListAPIView):
-    queryset = PatientProfile.objects.all()
+class BulkCreateUpdateAPIView(generics.GenericAPIView):
+    """
+    POST creates and PATCH updates (by `id`) a JSON array of items in one transaction.
+
+    With `owner_field`, users other than staff only write rows whose
+    `owner_field` is themselves: other rows cannot be updated (403) and
+    items cannot name another owner.
+    """
+    read_serializer_class = None
+    owner_field = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.restricted(self.request):
+            queryset = queryset.filter(**{self.owner_field: self.request.user.pk})
+        return queryset
+
+    def restricted(self, request):
+        return self.owner_field is not None and not request.user.is_staff
+
+    def check_targets(self, request):
+        """403 when a PATCH names existing rows outside get_queryset()."""
+        ids = {item.get('id') for item in request.data if isinstance(item, dict)}
+        ids = [pk for pk in ids if isinstance(pk, int)]
+        if self.queryset.model.objects.filter(pk__in=ids).exclude(pk__in=self.get_queryset()).exists():
+            raise PermissionDenied('You can only update your own rows.')
+
+    def check_owners(self, request, items):
+        if any(item.get(self.owner_field, request.user.pk) != request.user.pk for item in items):
+            raise PermissionDenied('You can only write rows of your own.')
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(many=True, max_length=getattr(settings, 'BULK_MAX_ITEMS', 1000))
+        return super().get_serializer(*args, **kwargs)
+
+    def perform_write(self, serializer):
+        with transaction.atomic():
+            return serializer.save()
+
+    def write(self, request, instance, status_code):
+        if instance is not None and self.restricted(request) and isinstance(request.data, list):
+            self.check_targets(request)
+        serializer = self.get_serializer(instance, data=request.data, partial=instance is not None)
+        serializer.is_valid(raise_exception=True)
+        if self.restricted(request):
+            self.check_owners(request, serializer.validated_data)
+        objs = self.perform_write(serializer)
+        rows = self.get_queryset().in_bulk([obj.pk for obj in objs])
+        data = self.read_serializer_class([rows[obj.pk] for obj in objs], many=True,
+                                          context=self.get_serializer_context()).data
+        return Response(data, status=status_code)
+
+    def post(self, request, *args, **kwargs):
+        return self.write(request, None, status.HTTP_201_CREATED)
+
+    def patch(self, request, *args, **kwargs):
+        return self.write(request, self.get_queryset(), status.HTTP_200_OK)
+
+
+class DoctorProfileBulkAPIView(BulkCreateUpdateAPIView):
+    queryset = DoctorProfile.objects.for_catalog()
+    serializer_class = DoctorProfileBulkSerializer
+    read_serializer_class = DoctorProfileListSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+
+class DoctorImportAPIView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': ['No file was submitted.']})
+        file_format = request.data.get('file_format') or detect_format(upload.name)
+        if file_format not in IMPORT_FORMATS:
+            raise ValidationError({'file_format': [f'Choose one of: {", ".join(IMPORT_FORMATS)}.']})
+        return Response(import_doctors(upload, file_format))
+
+
+class PatientProfileListAPIView(FastListMixin, SparseQuerysetMixin, SelectablePaginationMixin, generics.ListAPIView):
+    queryset = PatientProfile.objects.select_related('user')
     serializer_class = PatientProfileListSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     pagination_class = PatientProfilePagination
+    keyset_pagination_class = PatientProfileKeysetPagination
 
 
-class PatientProfileDetailAPIView(generics.RetrieveAPIView):
+class PatientProfileDetailAPIView(SparseQuerysetMixin, generics.RetrieveAPIView):
     queryset = PatientProfile.objects.all()
     serializer_class = PatientProfileDetailSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, CheckPatientProfile]
@@ -96,39 +236,72 @@ class PatientProfileCreateAPIView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, CheckPatientProfile]
 
 
-class DepartmentListAPIView(generics.ListAPIView):
+class DepartmentListAPIView(CachedResponseMixin, FastListMixin, SparseQuerysetMixin, generics.ListAPIView):
     queryset = Department.objects.all()
     serializer_class = DepartmentListSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     pagination_class = DepartmentPagination
+    cache_namespaces = ('departments',)
     filter_backends = [SearchFilter]
     search_fields = ['department_name']
 
 
-class SpecialtyListAPIView(generics.ListAPIView):
+class SpecialtyListAPIView(CachedResponseMixin, FastListMixin, SparseQuerysetMixin, generics.ListAPIView):
     queryset = Specialty.objects.all()
     serializer_class = SpecialtyListSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     pagination_class = SpecialtyPagination
+    cache_namespaces = ('specialties',)
     filter_backends = [SearchFilter]
     search_fields = ['specialty_name']
 
 
-class AppointmentListAPIView(generics.ListAPIView):
-    queryset = Appointment.objects.all()
+class AppointmentListAPIView(StreamingExportMixin, FastListMixin, SparseQuerysetMixin, SelectablePaginationMixin,
+                             generics.ListAPIView):
+    queryset = Appointment.objects.select_related('patient__user', 'doctor')
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, CheckDoctorProfile, CheckPatientProfile]
+    pagination_class = AppointmentPagination
+    keyset_pagination_class = AppointmentKeysetPagination
+    export_columns = APPOINTMENT_COLUMNS
+    export_filename = 'appointments'
 
 
 class AppointmentCreateAPIView(generics.CreateAPIView):
-    serializer_class = AppointmentSerializer
+    serializer_class = AppointmentCreateSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, CheckDoctorProfile]
 
+    def perform_create(self, serializer):
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise AppointmentConflict()
 
-class MedicalRecordListAPIView(generics.ListAPIView):
-    queryset = MedicalRecord.objects.all()
+
+class AppointmentBulkAPIView(BulkCreateUpdateAPIView):
+    queryset = Appointment.objects.select_related('patient__user', 'doctor')
+    serializer_class = AppointmentBulkSerializer
+    read_serializer_class = AppointmentSerializer
+    permission_classes = [IsDoctorOrAdmin]
+    owner_field = 'doctor_id'
+
+    def perform_write(self, serializer):
+        try:
+            return super().perform_write(serializer)
+        except IntegrityError:
+            raise AppointmentConflict()
+
+
+class MedicalRecordListAPIView(StreamingExportMixin, FastListMixin, SparseQuerysetMixin, SelectablePaginationMixin,
+                               generics.ListAPIView):
+    queryset = MedicalRecord.objects.select_related('patient__user', 'doctor')
     serializer_class = MedicalRecordSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, CheckDoctorProfile, CheckPatientProfile]
+    pagination_class = MedicalRecordPagination
+    keyset_pagination_class = MedicalRecordKeysetPagination
+    export_columns = MEDICAL_RECORD_COLUMNS
+    export_filename = 'medical_records'
 
 
 class MedicalRecordCreateAPIView(generics.CreateAPIView):
@@ -136,19 +309,27 @@ class MedicalRecordCreateAPIView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, CheckDoctorProfile]
 
 
-class MedicalRecordRetrieveAPIView(generics.RetrieveUpdateDestroyAPIView):
+class MedicalRecordBulkAPIView(BulkCreateUpdateAPIView):
+    queryset = MedicalRecord.objects.select_related('patient__user', 'doctor')
+    serializer_class = MedicalRecordBulkSerializer
+    read_serializer_class = MedicalRecordSerializer
+    permission_classes = [IsDoctorOrAdmin]
+    owner_field = 'doctor_id'
+
+
+class MedicalRecordRetrieveAPIView(SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = MedicalRecord.objects.all()
     serializer_class = MedicalRecordSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, CheckDoctorProfile]
 
 
-class FeedbackListAPIView(generics.ListAPIView):
-    queryset = Feedback.objects.all()
+class FeedbackListAPIView(FastListMixin, SparseQuerysetMixin, generics.ListAPIView):
+    queryset = Feedback.objects.select_related('patient__user', 'doctor')
     serializer_class = FeedbackSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, CheckPatientProfile]
 
     def get_queryset(self):
-        return Feedback.objects.filter(patient__user=self.request.user)
+        return super().get_queryset().filter(patient__user=self.request.user)
 
 
 class FeedbackCreateAPIView(generics.CreateAPIView):
@@ -160,3 +341,57 @@ class FeedbackRetrieveAPIView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Feedback.objects.all()
     serializer_class = FeedbackSerializer
     permission_classes = [permissions.IsAdminUser]
+
+
+class ChatMessageListAPIView(FastListMixin, SparseQuerysetMixin, generics.ListAPIView):
+    serializer_class = MessageSerializer
+    permission_classes = [permissions.IsAuthenticated, CheckChatMember]
+    pagination_class = MessageKeysetPagination
+    queryset = Message.objects.select_related('author__user', 'doctor')
+
+    def get_queryset(self):
+        return super().get_queryset().filter(chat_id=self.kwargs['pk'])
+
+
+class ChatUploadCreateAPIView(generics.CreateAPIView):
+    """Start a chunked image/video upload; the file is then sent with PATCH to chat/uploads/<id>/."""
+    serializer_class = ChatUploadSerializer
+    permission_classes = [permissions.IsAuthenticated, CheckChatMember]
+
+    def perform_create(self, serializer):
+        author = PatientProfile.objects.filter(user=self.request.user, chat=self.kwargs['pk']).first()
+        if author is None:
+            raise PermissionDenied('Only the patients of this chat can post to it.')
+        serializer.save(chat_id=self.kwargs['pk'], author=author)
+
+
+class ChatUploadAPIView(generics.RetrieveDestroyAPIView):
+    """
+    GET/HEAD tells where to resume, PATCH appends the raw chunk at its
+    Upload-Offset, DELETE aborts. The chunk that completes the upload
+    posts the file to the chat and returns the new message.
+    """
+    serializer_class = ChatUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ChatUpload.objects.using(DEFAULT_DB_ALIAS).select_related('message__author__user', 'message__doctor').filter(
+            author__user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        upload = self.get_object()
+        return Response(self.get_serializer(upload).data, headers={'Upload-Offset': str(upload.received)})
+
+    def patch(self, request, *args, **kwargs):
+        upload = self.get_object()
+        if upload.message_id is not None:
+            raise UploadConflict('This upload is already complete.')
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            raise ValidationError({'Upload-Offset': 'This header is required.'})
+        write_chunk(request, upload, offset)
+        return Response(self.get_serializer(upload).data, headers={'Upload-Offset': str(upload.received)})
+
+    def perform_destroy(self, instance):
+        discard(instance)
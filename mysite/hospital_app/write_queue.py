@@ -0,0 +1,73 @@
+import threading
+from collections import deque
+from contextlib import contextmanager
+from django.conf import settings
+
+
+class WriteQueue:
+    """
+    First-come, first-served lock around this process's write transactions.
+
+    SQLite allows one writer at a time; without a queue, concurrent writers
+    spin in the busy handler and the unlucky ones fail with "database is
+    locked". Waiters are woken strictly in arrival order. A waiter that is
+    not served within `timeout` seconds goes ahead unqueued and relies on
+    the busy timeout, so a stuck holder cannot block writes forever.
+    The hospital_app.backends.sqlite3 engine takes it around every write
+    transaction. slot() is reentrant: a thread that already holds the
+    queue, such as one writing from an on_commit callback, goes straight
+    through.
+    """
+
+    def __init__(self, timeout=20, enabled=True):
+        self.timeout = timeout
+        self.enabled = enabled
+        self.mutex = threading.Lock()
+        self.waiters = deque()
+        self.busy = False
+        self.owner = None
+
+    def acquire(self):
+        with self.mutex:
+            if not self.busy:
+                self.busy = True
+                return True
+            waiter = threading.Event()
+            self.waiters.append(waiter)
+        if waiter.wait(self.timeout):
+            return True
+        with self.mutex:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+                return False
+        return True
+
+    def hold(self):
+        """Take the queue for the calling thread; True if it was taken here and must be released."""
+        if not self.enabled or self.owner == threading.get_ident():
+            return False
+        if not self.acquire():
+            return False
+        self.owner = threading.get_ident()
+        return True
+
+    def release(self):
+        with self.mutex:
+            self.owner = None
+            if self.waiters:
+                self.waiters.popleft().set()
+            else:
+                self.busy = False
+
+    @contextmanager
+    def slot(self):
+        acquired = self.hold()
+        try:
+            yield
+        finally:
+            if acquired:
+                self.release()
+
+
+write_queue = WriteQueue(timeout=getattr(settings, 'SQLITE_WRITE_QUEUE_TIMEOUT', 20),
+                         enabled=getattr(settings, 'SQLITE_WRITE_QUEUE', False))
@@ -12,6 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
+from hospital_app.auth import JWTAuthMiddleware
 from hospital_app.routing import websocket_urlpatterns
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
@@ -20,8 +21,10 @@ application = ProtocolTypeRouter(
     {
         "http": get_asgi_application(),
         "websocket": AuthMiddlewareStack(
-            URLRouter(
-                websocket_urlpatterns
+            JWTAuthMiddleware(
+                URLRouter(
+                    websocket_urlpatterns
+                )
             )
         )
     }
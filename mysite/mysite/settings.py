@@ -60,6 +60,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'hospital_app.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -92,31 +93,173 @@ TEMPLATES = [
 WSGI_APPLICATION = 'mysite.wsgi.application'
 ASGI_APPLICATION = 'mysite.asgi.application'
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
-        "CONFIG": {
-            "hosts": [("redis", 6379)],
+# CHANNEL_LAYER_BACKEND=memory keeps everything in one process (single node, tests, load tests).
+# With several REDIS_HOSTS channels_redis shards groups and channels over them by consistent hashing.
+CHANNEL_LAYER_BACKEND = os.getenv('CHANNEL_LAYER_BACKEND', 'redis')
+REDIS_HOSTS = [
+    host if '://' in host else (host.partition(':')[0], int(host.partition(':')[2] or 6379))
+    for host in os.getenv('REDIS_HOSTS', 'redis:6379').split(',') if host
+]
+
+if CHANNEL_LAYER_BACKEND == 'memory':
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+            "CONFIG": {
+                "capacity": int(os.getenv('CHANNEL_LAYER_CAPACITY', 1000)),
+            },
         },
-    },
-}
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": REDIS_HOSTS,
+                "capacity": int(os.getenv('CHANNEL_LAYER_CAPACITY', 1000)),
+            },
+        },
+    }
+
+CHAT_WRITE_BATCH_SIZE = 100
+CHAT_WRITE_FLUSH_INTERVAL = 0.5
+CHAT_WRITE_MAX_RETRIES = 3
+CHAT_REPLAY_SIZE = 50
+CHAT_REPLAY_ROOMS = 1000
 
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# DB_ENGINE=postgresql reads DB_NAME, DB_USER, DB_PASSWORD, DB_HOST and DB_PORT; each host[:port] in
+# DB_REPLICA_HOSTS becomes a "replica_<n>" alias that hospital_app.db_router reads from.
+# Postgres connections come from psycopg's pool (DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE per alias and process);
+# DB_POOL=false keeps one persistent connection per thread for DB_CONN_MAX_AGE seconds instead.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite3')
+DB_POOL = os.getenv('DB_POOL', 'true').lower() in ('1', 'true', 'yes')
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+
+# SQLITE_PROFILE=production tunes the SQLite database for concurrent use: WAL journal, synchronous=NORMAL,
+# memory-mapped reads, a bigger page cache, BEGIN IMMEDIATE transactions that wait up to
+# SQLITE_BUSY_TIMEOUT seconds for the write lock, and hospital_app.write_queue serializing this
+# process's write transactions in arrival order (through the hospital_app.backends.sqlite3 engine).
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'default')
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 20))
+SQLITE_PRODUCTION_OPTIONS = {
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': SQLITE_BUSY_TIMEOUT,
+    'init_command': ';'.join([
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA mmap_size={int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))}',
+        f'PRAGMA cache_size=-{int(os.getenv("SQLITE_CACHE_KB", 64 * 1024))}',
+        f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT * 1000}',
+        'PRAGMA temp_store=MEMORY',
+    ]),
 }
+SQLITE_WRITE_QUEUE = DB_ENGINE != 'postgresql' and SQLITE_PROFILE == 'production'
+SQLITE_WRITE_QUEUE_TIMEOUT = SQLITE_BUSY_TIMEOUT
+
+
+def postgres_database(host, port):
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('DB_NAME', 'postgres'),
+        'USER': os.getenv('DB_USER', 'postgres'),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': host,
+        'PORT': port,
+        'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if DB_POOL:
+        database['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        }
+    return database
+
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {'default': postgres_database(os.getenv('DB_HOST', 'db'), os.getenv('DB_PORT', '5432'))}
+    for number, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1):
+        replica = postgres_database(host.partition(':')[0], host.partition(':')[2] or os.getenv('DB_PORT', '5432'))
+        replica['TEST'] = {'MIRROR': 'default'}
+        DATABASES[f'replica_{number}'] = replica
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'hospital_app.backends.sqlite3' if SQLITE_WRITE_QUEUE else 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': SQLITE_PRODUCTION_OPTIONS if SQLITE_PROFILE == 'production' else {},
+        }
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['hospital_app.db_router.PrimaryReplicaRouter']
+# After a write the client reads from the primary for this long (covers replication lag).
+DATABASE_STICKY_COOKIE = 'db_primary'
+DATABASE_STICKY_SECONDS = int(os.getenv('DB_STICKY_SECONDS', 5))
+
+# Read-mostly catalog responses (doctors, departments, specialties) are cached here.
+# Set CACHE_REDIS_URL to share the cache, and its invalidations, between workers.
+if os.getenv('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 5000)),
+            },
+        }
+    }
+
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 300))
+
 
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+# PASSWORD_HASHER_PROFILE: "default" keeps Django's hashers, "argon2" prefers Argon2 (needs argon2-cffi),
+# "tuned" uses PBKDF2 with PASSWORD_PBKDF2_ITERATIONS. Stored hashes are upgraded on the next login.
+PASSWORD_HASHER_PROFILE = os.getenv('PASSWORD_HASHER_PROFILE', 'default')
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', 260000))
+
+if PASSWORD_HASHER_PROFILE == 'argon2':
+    PASSWORD_HASHERS = [
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ]
+elif PASSWORD_HASHER_PROFILE == 'tuned':
+    PASSWORD_HASHERS = [
+        'hospital_app.hashers.TunedPBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ]
+
+LOGIN_FAILURE_CACHE_SECONDS = int(os.getenv('LOGIN_FAILURE_CACHE_SECONDS', 30))
+
+# Bulk imports hash passwords in a process pool once a batch has PASSWORD_HASH_POOL_MIN passwords.
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 0)) or os.cpu_count()
+PASSWORD_HASH_POOL_MIN = int(os.getenv('PASSWORD_HASH_POOL_MIN', 32))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -165,6 +308,27 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Uploaded profile pictures and chat images get resized copies (longest side in pixels) in each format,
+# rendered by IMAGE_VARIANT_WORKERS background processes; 0 renders inline after the upload commits.
+IMAGE_VARIANT_SIZES = {'thumb': 160, 'card': 480, 'large': 1280}
+IMAGE_VARIANT_FORMATS = ['webp', 'jpeg']
+IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', 80))
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
+# Chat images and videos are uploaded in chunks of at most CHAT_UPLOAD_CHUNK_SIZE bytes, appended to a part
+# file in CHAT_UPLOAD_TEMP_DIR (keep it on the same filesystem as MEDIA_ROOT so finished files are moved,
+# not copied). Unfinished uploads are removed by prune_uploads after CHAT_UPLOAD_EXPIRE_HOURS.
+# Only one chunk of an upload is written at a time; that lock lives in the default cache, so with more
+# than one worker process set CACHE_REDIS_URL. Under ASGI Django reads each chunk body completely before
+# the view sees it, so also cap request bodies at CHAT_UPLOAD_CHUNK_SIZE in the proxy.
+CHAT_UPLOAD_TEMP_DIR = os.getenv('CHAT_UPLOAD_TEMP_DIR', os.path.join(BASE_DIR, 'upload_parts'))
+CHAT_UPLOAD_CHUNK_SIZE = int(os.getenv('CHAT_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+CHAT_UPLOAD_MAX_SIZE = {
+    'image': int(os.getenv('CHAT_UPLOAD_MAX_IMAGE_SIZE', 20 * 1024 * 1024)),
+    'video': int(os.getenv('CHAT_UPLOAD_MAX_VIDEO_SIZE', 1024 * 1024 * 1024)),
+}
+CHAT_UPLOAD_EXPIRE_HOURS = int(os.getenv('CHAT_UPLOAD_EXPIRE_HOURS', 24))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -184,6 +348,15 @@ REST_FRAMEWORK = {
     )
 }
 
+APPOINTMENT_SLOT_MINUTES = 30
+AVAILABILITY_MAX_DAYS = 31
+
+BULK_MAX_ITEMS = 1000
+BULK_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_CHUNK_SIZE = 500
+FAST_READ_SERIALIZERS = True
+
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
     'allauth.account.auth_backends.AuthenticationBackend',
@@ -199,3 +372,11 @@ SIMPLE_JWT = {
     "UPDATE_LAST_LOGIN": False,
 }
 
+# Logouts reach the other workers through the default cache, so that needs to be shared (CACHE_REDIS_URL).
+# With the LocMem default another worker only sees a logout once the writer has stored it and its cached
+# "not blacklisted" answer, kept up to JWT_BLACKLIST_NEGATIVE_SECONDS, has expired.
+JWT_BLACKLIST_NEGATIVE_SECONDS = 30
+JWT_BLACKLIST_BATCH_SIZE = 200
+JWT_BLACKLIST_FLUSH_INTERVAL = 1.0
+JWT_BLACKLIST_MAX_BACKOFF = 60.0
+